@@ -0,0 +1,42 @@
+'''Compares the plain copy backup against the compressed formats: backup size, backup time and restore time.
+Usage: python benchmarks/bench_backup_compression.py [rows]'''
+import os, sys, time, shutil, sqlite3, tempfile, builtins
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db_tools.sqlite_backup import SQLite_Backup, zstandard
+
+def build_database(db_path, rows):
+    '''Synthetic table with repetitive text, similar to a typical export'''
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE measures (id INTEGER PRIMARY KEY, sensor TEXT, value REAL, tags TEXT)")
+    conn.executemany("INSERT INTO measures (sensor, value, tags) VALUES (?, ?, ?)",
+                     ((f"sensor_{i % 500}", i * 0.37, f"line{i % 7},shift{i % 3}") for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+def run(rows=500000):
+    folder = tempfile.mkdtemp(prefix="db_tools_bench_")
+    db_path = os.path.join(folder, "bench.db")
+    build_database(db_path, rows)
+    builtins.input = lambda *args: "n" # Skips the checkpoint overwrite prompt
+    handler = SQLite_Backup(db_path, backup_time=-1)
+    formats = [("copy", "none"), ("copy", "lzma")] + ([("copy", "zstd")] if zstandard is not None else [])
+    print(f"\n{'format':<12}{'size MB':>10}{'ratio':>8}{'backup s':>10}{'restore s':>11}")
+    db_size = os.path.getsize(db_path)
+    for engine, compression in formats:
+        handler.set_backup_rules(engine=engine, compression=compression)
+        result = handler._backup(db_path)
+        restore_path = os.path.join(folder, "restored.db")
+        start = time.perf_counter()
+        handler._restore(result["backup_path"], restore_path)
+        restore_time = time.perf_counter() - start
+        name = compression if compression != "none" else engine
+        print(f"{name:<12}{result['bytes'] / 2**20:>10.2f}{db_size / result['bytes']:>8.2f}"
+              f"{result['seconds']:>10.3f}{restore_time:>11.3f}")
+        os.remove(result["backup_path"])
+        os.remove(restore_path)
+        time.sleep(1) # Backup names have a resolution of one second
+    handler.close_conn(verbose=False)
+    shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,49 @@
+'''Compares DataFrame.to_sql against the bulk writer on a tall frame.
+Usage: python benchmarks/bench_bulk_writer.py [rows]'''
+import os, sys, time, shutil, sqlite3, tempfile
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db_tools.bulk_writer import write_dataframe
+
+def build_frame(rows):
+    '''Synthetic frame mixing the usual dtypes, with some missing values'''
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=rows)
+    values[::17] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "value": values,
+        "count": rng.integers(0, 1000, size=rows),
+        "sensor": pd.Series([f"sensor_{i % 500}" for i in range(rows)]),
+        "ok": rng.integers(0, 2, size=rows).astype(bool),
+        "timestamp": pd.date_range("2024-01-01", periods=rows, freq="s"),
+    })
+
+def timed(label, function, rows):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22}{elapsed:>10.3f}s{rows / elapsed:>14,.0f} rows/s")
+    return elapsed
+
+def run(rows=1000000):
+    folder = tempfile.mkdtemp(prefix="db_tools_bench_")
+    df = build_frame(rows)
+    print(f"\n{rows:,} rows x {len(df.columns)} columns")
+    results = {}
+    for label, function in [
+        ("pandas to_sql", lambda conn: df.to_sql("bench", conn, if_exists="replace", index=False)),
+        ("bulk writer", lambda conn: write_dataframe(conn, df, "bench")),
+        ("bulk writer, relaxed", lambda conn: write_dataframe(conn, df, "bench", relax=True)),
+    ]:
+        db_path = os.path.join(folder, f"{label.replace(' ', '_').replace(',', '')}.db")
+        conn = sqlite3.connect(db_path)
+        results[label] = timed(label, lambda: (function(conn), conn.commit()), rows)
+        conn.close()
+    print(f"Speed-up over to_sql: {results['pandas to_sql'] / results['bulk writer']:.2f}x "
+          f"({results['pandas to_sql'] / results['bulk writer, relaxed']:.2f}x relaxed)")
+    shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
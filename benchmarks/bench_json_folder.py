@@ -0,0 +1,36 @@
+'''Compares the per-file process_jsons against the batched mode, in files/s.
+Usage: python benchmarks/bench_json_folder.py [files]'''
+import os, sys, json, time, shutil, tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db_tools import JSONhandler
+
+def build_folder(folder, files, tables=10):
+    '''Synthetic metadata files spread over *tables* subfolders, with a few optional keys'''
+    for i in range(files):
+        subfolder = os.path.join(folder, f"table_{i % tables}")
+        os.makedirs(subfolder, exist_ok=True)
+        data = {"id": i, "score": i * 0.5, "name": f"item {i}", "tags": [f"tag{i % 7}", f"tag{i % 11}"]}
+        if i % 3 == 0:
+            data["extra"] = {"nested": i}
+        with open(os.path.join(subfolder, f"file_{i}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+def run(files=20000):
+    root = tempfile.mkdtemp(prefix="db_tools_bench_")
+    print(f"\n{files:,} JSON files")
+    results = {}
+    for label, options in [("per file", {}), ("batched", {"batched": True}), ("batched, 1 worker", {"batched": True, "workers": 1})]:
+        folder = os.path.join(root, label.replace(" ", "_").replace(",", ""))
+        build_folder(folder, files)
+        handler = JSONhandler(os.path.join(folder, "bench.db"))
+        start = time.perf_counter()
+        handler.process_jsons(folder, **options)
+        elapsed = time.perf_counter() - start
+        handler.close_conn(verbose=False)
+        results[label] = elapsed
+        print(f"{label:<20}{elapsed:>10.3f}s{files / elapsed:>12,.0f} files/s")
+    print(f"Speed-up: {results['per file'] / results['batched']:.2f}x")
+    shutil.rmtree(root)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
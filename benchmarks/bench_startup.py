@@ -0,0 +1,49 @@
+'''Startup cost of the typical entry points, measured in fresh interpreters with -X importtime: total import time and
+whether the heavy optional dependencies (pandas, numpy, openpyxl) got loaded. Exits with code 1 if a backup-only or
+handler-only start loads any of them.
+Usage: python benchmarks/bench_startup.py [runs]'''
+import os, sys, re, time, subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY = ("pandas", "numpy", "openpyxl")
+ENTRY_POINTS = [ # (label, statement, heavy modules allowed)
+    ("package", "import db_tools", False),
+    ("SQLite_Backup", "from db_tools import SQLite_Backup", False),
+    ("BackupScheduler", "from db_tools import BackupScheduler", False),
+    ("QueryBuilder", "from db_tools import QueryBuilder", False),
+    ("SQLite_Data_Extractor", "from db_tools import SQLite_Data_Extractor", False),
+    ("extractor retrieve", "from db_tools import SQLite_Data_Extractor as E; "
+                           "E(':memory:', source_folder_path=__import__('tempfile').gettempdir()).retrieve('sqlite_master')", True),
+]
+
+def measure(statement) -> dict:
+    '''Imports of one fresh interpreter running *statement*: wall time, cumulative import time and heavy modules'''
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    imports = {}
+    for line in process.stderr.splitlines(): # import time: self [us] | cumulative | imported package
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            imports[match.group(4)] = (int(match.group(2)), len(match.group(3)))
+    top_level = sum(cumulative for cumulative, indent in imports.values() if indent == 1)
+    return {"wall_s": wall, "import_s": top_level / 1e6, "heavy": [name for name in HEAVY if name in imports]}
+
+def run(runs=3):
+    python = measure("pass")
+    print(f"\nInterpreter alone: {python['wall_s']:.3f}s")
+    print(f"{'entry point':<24}{'import s':>10}{'wall s':>10}  heavy modules")
+    regressions = []
+    for label, statement, heavy_allowed in ENTRY_POINTS:
+        results = [measure(statement) for _ in range(runs)]
+        best = min(results, key=lambda result: result["wall_s"])
+        print(f"{label:<24}{best['import_s']:>10.3f}{best['wall_s']:>10.3f}  {', '.join(best['heavy']) or '-'}")
+        if best["heavy"] and not heavy_allowed:
+            regressions.append(f"{label} loads {', '.join(best['heavy'])}")
+    if regressions:
+        print("\nRegressions:\n    " + "\n    ".join(regressions))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
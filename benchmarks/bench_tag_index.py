@@ -0,0 +1,36 @@
+'''Compares filter_rows_by_tags answered by a table scan against the tag index.
+Usage: python benchmarks/bench_tag_index.py [rows]'''
+import os, sys, time, random, shutil, tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db_tools import QueryBuilder
+
+def build_table(handler, rows, vocabulary=200):
+    '''Synthetic table with 1 to 5 comma-separated tags per row'''
+    random.seed(0)
+    tags = [f"tag{i}" for i in range(vocabulary)]
+    handler.cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, tags TEXT)")
+    handler.cursor.executemany("INSERT INTO items (name, tags) VALUES (?, ?)",
+                               ((f"item {i}", ",".join(random.sample(tags, random.randint(1, 5)))) for i in range(rows)))
+    handler.conn.commit()
+
+def run(rows=1000000):
+    folder = tempfile.mkdtemp(prefix="db_tools_bench_")
+    handler = QueryBuilder(os.path.join(folder, "bench.db"))
+    build_table(handler, rows)
+    start = time.perf_counter()
+    handler.create_tag_index("items", "tags")
+    print(f"\n{rows:,} rows, index built in {time.perf_counter() - start:.3f}s")
+    print(f"{'query':<36}{'rows':>8}{'scan s':>10}{'index s':>10}{'speed-up':>10}")
+    for whitelist, blacklist in [(["tag7"], None), (["tag7", "tag42"], None), (["tag7"], ["tag1", "tag2"]), (None, ["tag3"])]:
+        timings = []
+        for use_index in (False, True):
+            start = time.perf_counter()
+            result = handler.filter_rows_by_tags("items", "tags", whitelist, blacklist, use_index=use_index)
+            timings.append(time.perf_counter() - start)
+        label = f"+{whitelist or []} -{blacklist or []}"
+        print(f"{label:<36}{len(result):>8}{timings[0]:>10.3f}{timings[1]:>10.3f}{timings[0] / timings[1]:>9.1f}x")
+    handler.close_conn(verbose=False)
+    shutil.rmtree(folder)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
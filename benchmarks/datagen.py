@@ -0,0 +1,104 @@
+'''Synthetic inputs for the benchmark suite: CSV, XLSX, JSON array, JSON lines, CSV and JSON folders and a populated
+database, all derived from the same seeded records so every run measures the same data.
+Usage: python benchmarks/datagen.py folder [small|medium|large|rows]'''
+import os, sys, csv, json, random, sqlite3
+from bench_json_folder import build_folder
+
+SCALES = {"small": 10000, "medium": 100000, "large": 1000000}
+COLUMNS = ["id", "sensor", "value", "count", "tags", "timestamp"]
+
+def scale_rows(scale) -> int:
+    '''Rows of a named scale, or the number itself'''
+    return SCALES[scale] if scale in SCALES else int(scale)
+
+def records(rows, seed=0, nested=False):
+    '''Measurement-like records with repetitive text, 1 to 4 tags and some missing values'''
+    rng = random.Random(seed)
+    tags = [f"tag{i}" for i in range(50)]
+    for i in range(rows):
+        record = {
+            "id": i,
+            "sensor": f"sensor_{i % 500}",
+            "value": None if i % 17 == 0 else round(rng.gauss(0, 1), 6),
+            "count": rng.randint(0, 1000),
+            "tags": ",".join(rng.sample(tags, rng.randint(1, 4))),
+            "timestamp": f"2024-01-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00",
+        }
+        if nested:  # JSON inputs also get lists and objects to flatten
+            record["tags"] = record["tags"].split(",")
+            record["meta"] = {"line": i % 7, "shift": {"id": i % 3}}
+        yield record
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows([record[column] for column in COLUMNS] for record in records(rows))
+
+def write_xlsx(path, rows, sheets=2):
+    '''Workbook with the rows split over *sheets* sheets'''
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    per_sheet = max(rows // sheets, 1)
+    for sheet in range(sheets):
+        worksheet = workbook.create_sheet(f"sheet{sheet + 1}")
+        worksheet.append(COLUMNS)
+        for record in records(per_sheet, seed=sheet):
+            worksheet.append([record[column] for column in COLUMNS])
+    workbook.save(path)
+
+def write_json(path, rows):
+    '''Top-level array of nested records'''
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, record in enumerate(records(rows, nested=True)):
+            f.write(("," if i else "") + json.dumps(record) + "\n")
+        f.write("]\n")
+
+def write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records(rows, nested=True):
+            f.write(json.dumps(record) + "\n")
+
+def write_csv_folder(folder, files, rows):
+    '''*files* CSV files sharing *rows* rows'''
+    os.makedirs(folder, exist_ok=True)
+    for i in range(files):
+        write_csv(os.path.join(folder, f"part_{i}.csv"), max(rows // files, 1))
+
+def write_database(db_path, rows):
+    '''Database with the records as table *measures*'''
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE measures (id INTEGER PRIMARY KEY, sensor TEXT, value REAL, count INTEGER, tags TEXT, timestamp TEXT)")
+    conn.executemany("INSERT INTO measures VALUES (?, ?, ?, ?, ?, ?)",
+                     ([record[column] for column in COLUMNS] for record in records(rows)))
+    conn.commit()
+    conn.close()
+
+def generate(folder, rows) -> dict:
+    '''Writes every input for *rows* rows into *folder* and returns their paths. Excel and the JSON folder are
+    smaller (rows / 10 and rows / 20) since they are much slower per row'''
+    os.makedirs(folder, exist_ok=True)
+    paths = {
+        "csv": os.path.join(folder, "data.csv"),
+        "xlsx": os.path.join(folder, "data.xlsx"),
+        "json": os.path.join(folder, "data.json"),
+        "jsonl": os.path.join(folder, "data.jsonl"),
+        "csv_folder": os.path.join(folder, "csv_folder"),
+        "json_folder": os.path.join(folder, "json_folder"),
+        "database": os.path.join(folder, "base.db"),
+    }
+    write_csv(paths["csv"], rows)
+    write_xlsx(paths["xlsx"], max(rows // 10, 1))
+    write_json(paths["json"], rows)
+    write_jsonl(paths["jsonl"], rows)
+    write_csv_folder(paths["csv_folder"], 10, rows)
+    build_folder(paths["json_folder"], max(rows // 20, 1))
+    write_database(paths["database"], rows)
+    return paths
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    for name, path in generate(sys.argv[1], scale_rows(sys.argv[2] if len(sys.argv) > 2 else "small")).items():
+        print(f"{name:<12}{path}")
@@ -0,0 +1,285 @@
+'''Benchmark suite of the db_tools subsystems. Synthetic inputs are generated once (see datagen.py) and every case
+runs in a fresh process, which reports its best time over the repeats, its throughput and its peak RSS. Results can be
+saved as a baseline and later runs compared against it, failing (exit code 1) when a case gets slower or uses more
+memory than the thresholds allow.
+Usage: python benchmarks/suite.py [--scale small|medium|large|rows] [--cases name,...] [--repeat n]
+                                  [--save results.json] [--baseline baseline.json] [--threshold 0.25]
+                                  [--memory-threshold 0.25]'''
+import os, sys, io, json, time, shutil, sqlite3, argparse, builtins, platform, tempfile, subprocess
+import contextlib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import datagen
+
+CASES = {}
+
+def case(name, unit):
+    '''Registers a case: a function of (inputs, rows, workdir) returning the timed function and the units it handles'''
+    def register(function):
+        CASES[name] = (unit, function)
+        return function
+    return register
+
+def extractor(workdir, inputs):
+    from db_tools import SQLite_Data_Extractor
+    import pandas, openpyxl # db_tools imports them on first use, kept out of the timings
+    return SQLite_Data_Extractor(os.path.join(workdir, "bench.db"), source_folder_path=os.path.dirname(inputs["csv"]))
+
+def database_copy(workdir, inputs):
+    db_path = os.path.join(workdir, "bench.db")
+    shutil.copy(inputs["database"], db_path)
+    return db_path
+
+@case("store_csv", "rows")
+def store_csv(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store("data.csv"), rows
+
+@case("store_csv_stream", "rows")
+def store_csv_stream(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    handler.set_rules(writer="bulk")
+    return lambda: handler.store("data.csv", stream=True), rows
+
+@case("store_xlsx", "rows")
+def store_xlsx(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store("data.xlsx"), max(rows // 10, 1)
+
+@case("store_xlsx_stream", "rows")
+def store_xlsx_stream(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store("data.xlsx", stream=True), max(rows // 10, 1)
+
+@case("store_json", "rows")
+def store_json(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store("data.json"), rows
+
+@case("store_json_stream", "rows")
+def store_json_stream(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store("data.json", stream=True), rows
+
+@case("store_jsonl_stream", "rows")
+def store_jsonl_stream(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store("data.jsonl", stream=True), rows
+
+@case("store_directory", "rows")
+def store_directory(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store_directory(inputs["csv_folder"]), rows
+
+@case("store_directory_parallel", "rows")
+def store_directory_parallel(inputs, rows, workdir):
+    handler = extractor(workdir, inputs)
+    return lambda: handler.store_directory(inputs["csv_folder"], parallel=True), rows
+
+@case("store_df", "rows")
+def store_df(inputs, rows, workdir):
+    import pandas as pd
+    handler = extractor(workdir, inputs)
+    df = pd.read_csv(inputs["csv"])
+    return lambda: handler.store_df(df, "measures"), rows
+
+@case("retrieve", "rows")
+def retrieve(inputs, rows, workdir):
+    from db_tools import SQLite_Data_Extractor
+    import pandas
+    handler = SQLite_Data_Extractor(database_copy(workdir, inputs), source_folder_path=workdir)
+    return lambda: handler.retrieve("measures"), rows
+
+@case("retrieve_columns", "rows")
+def retrieve_columns(inputs, rows, workdir):
+    from db_tools import SQLite_Data_Extractor
+    import pandas, numpy
+    handler = SQLite_Data_Extractor(database_copy(workdir, inputs), source_folder_path=workdir)
+    return lambda: handler.retrieve_columns("measures"), rows
+
+@case("filter_rows_by_tags", "rows")
+def filter_rows_by_tags(inputs, rows, workdir):
+    from db_tools import QueryBuilder
+    handler = QueryBuilder(database_copy(workdir, inputs))
+    return lambda: handler.filter_rows_by_tags("measures", "tags", ["tag7"], ["tag1"], use_index=False), rows
+
+@case("filter_rows_by_tags_index", "rows")
+def filter_rows_by_tags_index(inputs, rows, workdir):
+    from db_tools import QueryBuilder
+    handler = QueryBuilder(database_copy(workdir, inputs))
+    handler.create_tag_index("measures", "tags")
+    return lambda: handler.filter_rows_by_tags("measures", "tags", ["tag7"], ["tag1"], use_index=True), rows
+
+@case("migrate_table_online", "rows")
+def migrate_table_online(inputs, rows, workdir):
+    from db_tools import QueryBuilder
+    handler = QueryBuilder(database_copy(workdir, inputs))
+    return lambda: handler.migrate_table("measures", online=True), rows
+
+@case("process_jsons", "files")
+def process_jsons(inputs, rows, workdir):
+    from db_tools import JSONhandler
+    folder = shutil.copytree(inputs["json_folder"], os.path.join(workdir, "json_folder")) # Files are consumed
+    handler = JSONhandler(os.path.join(workdir, "bench.db"))
+    return lambda: handler.process_jsons(folder), max(rows // 20, 1)
+
+@case("process_jsons_batched", "files")
+def process_jsons_batched(inputs, rows, workdir):
+    from db_tools import JSONhandler
+    folder = shutil.copytree(inputs["json_folder"], os.path.join(workdir, "json_folder"))
+    handler = JSONhandler(os.path.join(workdir, "bench.db"))
+    return lambda: handler.process_jsons(folder, batched=True), max(rows // 20, 1)
+
+def backup_case(engine, compression="none"):
+    def setup(inputs, rows, workdir):
+        from db_tools import SQLite_Backup
+        db_path = database_copy(workdir, inputs)
+        handler = SQLite_Backup(db_path, backup_folder=os.path.join(workdir, "backup"), backup_time=-1)
+        handler.set_backup_rules(engine=engine, compression=compression, verbose=False)
+        return lambda: handler._backup(db_path), os.path.getsize(db_path) / 2**20
+    return setup
+
+case("backup_copy", "MB")(backup_case("copy"))
+case("backup_online", "MB")(backup_case("online"))
+case("backup_lzma", "MB")(backup_case("copy", "lzma"))
+
+@case("promote", "MB")
+def promote(inputs, rows, workdir):
+    from db_tools import SQLite_Backup
+    db_path = database_copy(workdir, inputs)
+    handler = SQLite_Backup(db_path, backup_folder=os.path.join(workdir, "backup"), backup_time=-1)
+    backup_name = os.path.basename(handler._backup(db_path)["backup_path"])
+    def run():
+        handler.promote(backup_name=backup_name)
+        handler.reconnect(verbose=False) # promote closes the connection
+    return run, os.path.getsize(db_path) / 2**20
+
+def peak_rss_mb():
+    '''Peak resident set size of this process in MB (ru_maxrss is in KB on Linux and in bytes on macOS). Without the
+    resource module (Windows) psutil is used if installed, else None: the memory is then not reported nor compared'''
+    try:
+        import resource
+    except ImportError:
+        try: # Optional dependency: pip install psutil
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss) / 2**20 # Peak working set on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def format_mb(value) -> str:
+    return "n/a" if value is None else f"{value:.0f}"
+
+def run_case(name, inputs, rows, repeat=1) -> dict:
+    '''Runs one case in this process: a fresh setup and work folder for every repeat, best time kept'''
+    unit, setup = CASES[name]
+    builtins.input = lambda *args: "y" # Confirmations (promote, checkpoints)
+    best, units, peak_before = None, 0, peak_rss_mb()
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp(prefix="db_tools_bench_")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                function, units = setup(inputs, rows, workdir)
+                start = time.perf_counter()
+                function()
+                elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        best = elapsed if best is None else min(best, elapsed)
+    return {"seconds": best, "units": units, "unit": unit, "throughput": units / best if best else None,
+            "peak_rss_mb": peak_rss_mb(), "setup_rss_mb": peak_before}
+
+def run_suite(rows, names, repeat=1) -> dict:
+    '''Generates the inputs and runs every case in its own process'''
+    folder = tempfile.mkdtemp(prefix="db_tools_bench_data_")
+    results = {}
+    try:
+        print(f"Generating inputs for {rows:,} rows...")
+        inputs = datagen.generate(folder, rows)
+        print(f"\n{'case':<28}{'seconds':>10}{'throughput':>20}{'peak MB':>10}")
+        for name in names:
+            process = subprocess.run([sys.executable, __file__, "--run-case", name, "--inputs", json.dumps(inputs),
+                                      "--rows", str(rows), "--repeat", str(repeat)], capture_output=True, text=True)
+            if process.returncode != 0: # Recorded, so a baseline comparison counts it
+                error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}"
+                results[name] = {"error": error}
+                print(f"{name:<28}failed: {error}")
+                continue
+            result = results[name] = json.loads(process.stdout.strip().splitlines()[-1])
+            throughput = f"{result['throughput']:,.0f} {result['unit']}/s"
+            print(f"{name:<28}{result['seconds']:>10.3f}{throughput:>20}{format_mb(result['peak_rss_mb']):>10}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return {"meta": {"rows": rows, "repeat": repeat, "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                     "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                     "machine": platform.machine(), "cpus": os.cpu_count()},
+            "results": results}
+
+def compare(current, baseline, threshold=0.25, memory_threshold=0.25) -> list:
+    '''Cases slower (or with a higher peak memory) than the baseline by more than the thresholds, failed cases and 
+    baseline cases no longer in the suite, as messages'''
+    regressions = [f"{name}: failed ({result['error']})" for name, result in current["results"].items() if "error" in result]
+    regressions += [f"{name}: in the baseline but no longer in the suite" for name in baseline["results"] if name not in CASES]
+    if current["meta"]["rows"] != baseline["meta"]["rows"]:
+        print(f"Warning: the baseline was run with {baseline['meta']['rows']:,} rows")
+    print(f"\n{'case':<28}{'baseline s':>12}{'now s':>10}{'change':>9}{'peak MB':>14}")
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None or "error" in reference or "error" in result:
+            continue
+        change = result["seconds"] / reference["seconds"] - 1
+        measured = result["peak_rss_mb"] is not None and reference["peak_rss_mb"] is not None
+        memory_change = result["peak_rss_mb"] / reference["peak_rss_mb"] - 1 if measured else 0
+        flag = ""
+        if change > threshold:
+            regressions.append(f"{name}: {change:+.0%} time")
+            flag = " <- slower"
+        if memory_change > memory_threshold:
+            regressions.append(f"{name}: {memory_change:+.0%} peak memory")
+            flag += " <- memory"
+        memory = f"{format_mb(reference['peak_rss_mb'])}->{format_mb(result['peak_rss_mb'])}"
+        print(f"{name:<28}{reference['seconds']:>12.3f}{result['seconds']:>10.3f}{change:>+9.0%}{memory:>14}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="db_tools benchmark suite")
+    parser.add_argument("--scale", default="small", help="small, medium, large or a number of rows")
+    parser.add_argument("--cases", help="comma-separated case names (all by default)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, the best time is kept")
+    parser.add_argument("--save", help="file to save the results to, e.g. to use them as a baseline")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed time increase (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="allowed peak memory increase")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--inputs", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_case: # Child process
+        print(json.dumps(run_case(args.run_case, json.loads(args.inputs), args.rows, args.repeat)))
+        return
+    if args.list:
+        print("\n".join(CASES))
+        return
+    names = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        sys.exit(f"Unknown case(s): {', '.join(unknown)}. Try --list.")
+    current = run_suite(datagen.scale_rows(args.scale), names, args.repeat)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f), args.threshold, args.memory_threshold)
+        if regressions:
+            print("\nRegressions:\n    " + "\n    ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions")
+    elif any("error" in result for result in current["results"].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
-from .sqlite_handler import SQLite_Data_Extractor, SQLite_Backup
-from .query_builder import QueryBuilder
-
-__version__ = "1.0.0"
-
-__all__ = [SQLite_Data_Extractor, SQLite_Backup, QueryBuilder]
-
+import importlib
+
+__version__ = "1.0.0"
+
+# Public name: module. Submodules are imported on first access, so importing the package (or only the backup
+# classes) doesn't load pandas
+_EXPORTS = {
+    "SQLite_Handler": ".sqlite_handler",
+    "SQLite_Data_Extractor": ".sqlite_data_extractor",
+    "SQLite_Backup": ".sqlite_backup",
+    "QueryBuilder": ".query_builder",
+    "JSONhandler": ".json_handler",
+    "BackupScheduler": ".backup_scheduler",
+    "AsyncHandler": ".async_handler",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value  # Later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,210 @@
+import copy, asyncio, sqlite3, itertools, threading
+from concurrent.futures import ThreadPoolExecutor
+from .sqlite_pool import apply_profile
+
+class _Worker:
+    '''One executor thread with its own copy of the handler. The copy is made on the thread on first use, so its
+    connection belongs to that thread'''
+
+    def __init__(self, name, make_handler):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.make_handler = make_handler
+        self.handler = None
+        self.pending = 0  # Jobs submitted and not finished
+        self.current = None  # Id of the running job, to interrupt it on cancellation
+        self.interrupted = None  # Id of the job interrupted, rolled back when it ends
+        self.lock = threading.Lock()
+
+    def run(self, job_id, function, args, kwargs):
+        if self.handler is None:
+            self.handler = self.make_handler()
+        with self.lock:
+            self.current = job_id
+        try:
+            return function(self.handler, *args, **kwargs)
+        finally:
+            with self.lock:
+                self.current = None
+                interrupted = self.interrupted == job_id
+            if interrupted and self.handler.conn.in_transaction:  # Later jobs don't inherit the cancelled transaction
+                self.handler.conn.rollback()
+
+    def interrupt(self, job_id):
+        '''Interrupts the statement of *job_id* if the job is still running'''
+        with self.lock:
+            if self.current == job_id:
+                self.interrupted = job_id
+                self.handler.conn.interrupt()
+
+    def close(self):
+        if self.handler is not None:
+            self.handler.conn.close()
+            self.handler = None
+
+class AsyncHandler:
+    '''Asyncio front-end of a handler (SQLite_Handler or any subclass). The database work runs on executor threads,
+    each with a copy of the handler (same rules and paths) on its own connection, and every method returns an
+    awaitable: reads are spread over *readers* read-only threads and run concurrently, writes go one after the other
+    through a single writer thread and backups run on their own thread, so a slow ingest or backup doesn't hold the
+    event loop or the reads. Cancelling an awaiting task interrupts the SQL statement in progress (work done in Python
+    by the method, like parsing a file, finishes in the background). Use the "read-heavy" or another WAL *profile* so
+    the readers don't wait for the writer.'''
+
+    def __init__(self, handler, readers: int = 4, profile: str = None, timeout: float = 30):
+        if handler.db_path == ":memory:":
+            raise ValueError("In-memory databases can't be shared by the async handler threads")
+        if readers < 1:
+            raise ValueError("The async handler needs at least one reader")
+        self.handler = handler
+        self.profile = profile
+        self.timeout = timeout  # Seconds a connection waits for a lock
+        self.writer = _Worker("db_tools_writer", lambda: self._clone())
+        self.readers = [_Worker(f"db_tools_reader_{i}", lambda: self._clone(query_only=True)) for i in range(readers)]
+        self.maintenance = _Worker("db_tools_backup", lambda: self._clone(backup=True))
+        self._job_ids = itertools.count()
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def execute(self, query, params=()) -> int:
+        '''Runs a statement on the writer and commits it. Returns the rows changed'''
+        return await self._submit(self.writer, _execute, query, params)
+
+    async def executemany(self, query, rows) -> int:
+        '''Runs a statement once per row of *rows* on the writer, in one transaction. Returns the rows changed'''
+        return await self._submit(self.writer, _executemany, query, rows)
+
+    async def fetchall(self, query, params=()) -> list:
+        '''Runs a query on a reader and returns its rows'''
+        return await self._submit(self._reader(), _fetchall, query, params)
+
+    async def read(self, method, *args, **kwargs):
+        '''Calls a method of the handler (e.g. "retrieve", "preview_table") on a reader. The reader connections are
+        read-only, so the method can't change the database'''
+        return await self._submit(self._reader(), _call, method, args, kwargs)
+
+    async def call(self, method, *args, **kwargs):
+        '''Calls a method of the handler (e.g. "store", "delete_rows") on the writer'''
+        return await self._submit(self.writer, _call, method, args, kwargs)
+
+    async def retrieve(self, table_name):
+        '''SQLite_Data_Extractor.retrieve on a reader'''
+        return await self.read("retrieve", table_name)
+
+    async def store(self, source, **kwargs):
+        '''SQLite_Data_Extractor.store on the writer'''
+        return await self.call("store", source, **kwargs)
+
+    async def backup(self):
+        '''SQLite_Backup backup of the database on the backup thread. Returns the backup result dictionary. The copy
+        engine is replaced by the online one, which doesn't block the writer'''
+        return await self._submit(self.maintenance, lambda handler: handler._backup(handler.db_path))
+
+    async def iterate(self, query, params=(), batch_size: int = 1000):
+        '''Async generator of the rows of a query in lists of up to *batch_size* rows. The cursor lives on one reader,
+        which fetches the next batch only when it is requested'''
+        worker = self._reader()
+        cursor = await self._submit(worker, _open_cursor, query, params)
+        try:
+            while rows := await self._submit(worker, lambda handler: cursor.fetchmany(batch_size)):
+                yield rows
+        finally:
+            if not self.closed:
+                await asyncio.shield(self._submit(worker, lambda handler: cursor.close()))
+
+    async def iterate_method(self, method, *args, **kwargs):
+        '''Async generator over the items of a generator method of the handler run on a reader, e.g.
+        iterate_method("retrieve_chunks", "table", chunksize=10000)'''
+        worker = self._reader()
+        generator = await self._submit(worker, _call, method, args, kwargs)
+        try:
+            while (item := await self._submit(worker, lambda handler: next(generator, _DONE))) is not _DONE:
+                yield item
+        finally:
+            if not self.closed:
+                await asyncio.shield(self._submit(worker, lambda handler: generator.close()))
+
+    async def close(self):
+        '''Waits for the submitted jobs and closes the connections of every thread'''
+        if self.closed:
+            return
+        loop = asyncio.get_running_loop()
+        for worker in [self.writer, self.maintenance, *self.readers]:
+            await loop.run_in_executor(worker.executor, worker.close)
+            worker.executor.shutdown(wait=False)
+        self.closed = True
+
+    """Internal methods"""
+    def _clone(self, query_only=False, backup=False):
+        '''Copy of the handler on a new connection, made on the thread that will use it'''
+        handler = copy.copy(self.handler)
+        if self.handler.instrumentation is not None:  # Its method wrappers are bound to the original handler
+            for name in self.handler.instrumentation.wrapped:
+                vars(handler).pop(name, None)
+        handler.conn = sqlite3.connect(handler.db_path, timeout=self.timeout)
+        handler.cursor = handler.conn.cursor()
+        handler.pool = handler.cache = handler._catalog = handler.instrumentation = None
+        if "_manifest" in vars(handler):
+            handler._manifest = None
+        if self.profile is not None:
+            apply_profile(handler.conn, self.profile)
+        if query_only:
+            handler.conn.execute("PRAGMA query_only = ON")
+        if backup and getattr(handler, "engine", None) == "copy":
+            handler.engine = "online"  # The copy engine closes the connection and can copy a write in progress
+        return handler
+
+    def _reader(self):
+        '''Reader with the fewest pending jobs'''
+        return min(self.readers, key=lambda worker: worker.pending)
+
+    async def _submit(self, worker, function, *args, **kwargs):
+        if self.closed:
+            raise RuntimeError("The async handler is closed")
+        loop = asyncio.get_running_loop()
+        job_id = next(self._job_ids)
+        worker.pending += 1
+        future = loop.run_in_executor(worker.executor, worker.run, job_id, function, args, kwargs)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            worker.interrupt(job_id)
+            raise
+        finally:
+            worker.pending -= 1
+
+_DONE = object()
+
+def _execute(handler, query, params):
+    try:
+        cursor = handler.conn.execute(query, params)
+        handler.conn.commit()
+        return cursor.rowcount
+    except Exception:
+        handler.conn.rollback()
+        raise
+
+def _executemany(handler, query, rows):
+    try:
+        cursor = handler.conn.executemany(query, rows)
+        handler.conn.commit()
+        return cursor.rowcount
+    except Exception:
+        handler.conn.rollback()
+        raise
+
+def _fetchall(handler, query, params):
+    return handler.conn.execute(query, params).fetchall()
+
+def _open_cursor(handler, query, params):
+    cursor = handler.conn.cursor()  # Own cursor, so other reads can run on the thread between batches
+    cursor.execute(query, params)
+    return cursor
+
+def _call(handler, method, args, kwargs):
+    return getattr(handler, method)(*args, **kwargs)
@@ -0,0 +1,107 @@
+import random, threading
+from concurrent.futures import ThreadPoolExecutor
+
+class BackupScheduler:
+    '''Background auto-backup for long-running services. Evaluates the backup_time of every managed SQLite_Backup 
+    against its checkpoint on a daemon thread and runs the due backups off the caller's thread.'''
+
+    def __init__(self, interval: float = 60, jitter: float = 0.1, max_concurrent: int = 1, keep: int = None):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be a fraction between 0 and 1")
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.interval = interval  # Seconds between checks
+        self.jitter = jitter  # Random +- fraction applied to every wait, so several services don't check in lockstep
+        self.max_concurrent = max_concurrent  # Backups allowed to run at the same time
+        self.keep = keep  # Restore points kept per database after every backup (see prune_backups), None to keep all
+        self.backups = []
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def add(self, backup):
+        '''Manages a SQLite_Backup object. Backups run outside the thread that created its connection, so the copy 
+        engine is switched to the online one'''
+        if backup.db_path == ":memory:":
+            raise ValueError("In-memory databases can't be backed up from the scheduler thread")
+        if backup.engine == "copy":
+            backup.set_backup_rules(engine="online")
+            print(f"Backup engine of *{backup.db_path}* set to online for the scheduler")
+        with self._lock:
+            if backup not in self.backups:
+                self.backups.append(backup)
+
+    def remove(self, backup):
+        '''Stops managing a SQLite_Backup object'''
+        with self._lock:
+            if backup in self.backups:
+                self.backups.remove(backup)
+
+    def start(self):
+        '''Starts the scheduler thread'''
+        if self.is_running():
+            print("Scheduler already running.")
+            return
+        self._stop_event.clear()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="db_tools_backup")
+        self._thread = threading.Thread(target=self._loop, name="db_tools_backup_scheduler", daemon=True)
+        self._thread.start()
+        print(f"Backup scheduler started: {len(self.backups)} database(s), checking every {self.interval}s")
+
+    def stop(self, wait: bool = True):
+        '''Stops the scheduler thread. With wait=True it also waits for the running backups to finish'''
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        print("Backup scheduler stopped.")
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def run_pending(self):
+        '''Submits every due backup that isn't already running. Returns the submitted SQLite_Backup objects'''
+        submitted = []
+        if self._executor is None: # Called without start()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="db_tools_backup")
+        with self._lock:
+            backups = [backup for backup in self.backups if backup not in self._running]
+        for backup in backups:
+            try:
+                remaining = backup.time_to_backup()
+            except Exception as e:
+                print(f"Error checking the backup of *{backup.db_path}*: {e}")
+                continue
+            if remaining is None or remaining > 0:
+                continue
+            with self._lock:
+                self._running.add(backup)
+            self._executor.submit(self._run_backup, backup)
+            submitted.append(backup)
+        return submitted
+
+    '''Internal methods'''
+    def _loop(self):
+        while not self._stop_event.is_set():
+            self.run_pending()
+            wait = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            self._stop_event.wait(wait)
+
+    def _run_backup(self, backup):
+        try:
+            backup._auto_backup(backup.db_path)
+            if self.keep is not None:
+                backup.prune_backups(self.keep)
+        except Exception as e:
+            print(f"Scheduled backup of *{backup.db_path}* failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(backup)
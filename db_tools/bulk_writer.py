@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+def sqlite_type(dtype) -> str:
+    '''SQLite column type for a pandas dtype, following the same affinities as DataFrame.to_sql'''
+    if pd.api.types.is_bool_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return "INTEGER"
+    return "TEXT"
+
+def column_array(series) -> list:
+    '''Converts a column to a list of values sqlite3 can bind, with missing values as None. Numeric columns are 
+    converted by NumPy in one pass instead of value by value'''
+    dtype = series.dtype
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        values = series.dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object)
+        fractional = (series.dt.microsecond.fillna(0) != 0).to_numpy()
+        if fractional.any():  # Same text as the sqlite3 datetime adapter used by to_sql
+            values[fractional] = series[fractional].dt.strftime("%Y-%m-%d %H:%M:%S.%f").to_numpy(dtype=object)
+        values[series.isna().to_numpy()] = None
+        return values.tolist()
+    if pd.api.types.is_timedelta64_dtype(dtype):  # Nanoseconds, like to_sql
+        values = series.to_numpy(dtype="timedelta64[ns]").view("int64").astype(object)
+        values[series.isna().to_numpy()] = None
+        return values.tolist()
+    if isinstance(dtype, np.dtype) and dtype.kind in "biu":  # No missing values possible
+        return series.to_numpy().tolist()
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        values = series.to_numpy()
+        missing = np.isnan(values)
+        if not missing.any():
+            return values.tolist()
+        values = values.astype(object)
+        values[missing] = None
+        return values.tolist()
+    return series.to_numpy(dtype=object, na_value=None).tolist()
+
+def write_dataframe(conn, df, table_name: str, if_exists: str = "replace", index: bool = False, 
+                    batch_size: int = 200000, relax: bool = False) -> int:
+    '''Writes a DataFrame to a table in a single transaction: the table is created once from the dtypes and the rows 
+    are inserted with executemany over column arrays, *batch_size* rows at a time. With relax=True the journal and 
+    the disk syncs are relaxed for the load and restored afterwards. If the caller has a transaction open, the write 
+    goes in a savepoint of it and is left uncommitted (and unrelaxed). Returns the number of rows written'''
+    if if_exists not in ("fail", "replace", "append"):
+        raise ValueError(f"Unsupported if_exists: {if_exists}. Try 'fail', 'replace' or 'append'.")
+    if index:
+        df = df.reset_index()
+    columns = [str(column) for column in df.columns]
+    quoted_columns = ", ".join(_quote(column) for column in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone()
+    if exists and if_exists == "fail":
+        raise ValueError(f"Table '{table_name}' already exists.")
+    nested = conn.in_transaction  # The journal mode can't change inside a transaction
+    restore = _relax(conn) if relax and not nested else None
+    try:
+        conn.execute("SAVEPOINT write_dataframe")
+        try:
+            if exists and if_exists == "replace":
+                conn.execute(f'DROP TABLE {_quote(table_name)}')
+            if not exists or if_exists == "replace":
+                definitions = ", ".join(f'{_quote(column)} {sqlite_type(dtype)}' for column, dtype in zip(columns, df.dtypes))
+                conn.execute(f'CREATE TABLE {_quote(table_name)} ({definitions})')
+            insert = f'INSERT INTO {_quote(table_name)} ({quoted_columns}) VALUES ({placeholders})'
+            for start in range(0, len(df), batch_size):
+                batch = df.iloc[start:start + batch_size]
+                arrays = [column_array(batch.iloc[:, i]) for i in range(len(columns))]
+                conn.executemany(insert, zip(*arrays))
+        except Exception:
+            conn.execute("ROLLBACK TO write_dataframe")
+            raise
+        finally:
+            conn.execute("RELEASE write_dataframe")  # Commits unless the caller's transaction is open
+    finally:
+        if restore is not None:
+            restore()
+    return len(df)
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _relax(conn):
+    '''Turns off the disk syncs (and moves the rollback journal to memory unless the database is in WAL mode). 
+    Returns a function that restores the previous settings'''
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.execute("PRAGMA synchronous = OFF")
+    if journal_mode.lower() != "wal":
+        conn.execute("PRAGMA journal_mode = MEMORY").fetchall()
+    def restore():
+        if journal_mode.lower() != "wal":
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}").fetchall()
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+    return restore
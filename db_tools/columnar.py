@@ -0,0 +1,104 @@
+import numpy as np
+try: # Optional dependency: pip install pyarrow
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+NONE = type(None)
+
+def column_array(values) -> np.ndarray:
+    '''Typed array of a batch of column values: int64 for integers, float64 for reals and for integers with missing
+    values (NaN, like read_sql), object for text, blobs, mixed values and columns with only missing values'''
+    kinds = set(map(type, values))
+    missing = NONE in kinds
+    kinds.discard(NONE)
+    try:
+        if kinds == {int} and not missing:
+            return np.array(values, dtype=np.int64)
+        if kinds and kinds <= {int, float}:
+            return np.array(values, dtype=np.float64)
+    except OverflowError:  # Integers beyond 64 bits
+        pass
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+def concatenate(parts) -> np.ndarray:
+    '''Joins the batch arrays of a column into one array. Batches with only missing values take the type of the rest
+    of the column, so a column doesn't end as object because its first batch was empty'''
+    if not parts:
+        return np.empty(0, dtype=object)
+    typed = [part for part in parts if part.dtype != object or any(value is not None for value in part)]
+    dtypes = {part.dtype for part in typed}
+    if dtypes and dtypes <= {np.dtype(np.int64), np.dtype(np.float64)}:
+        dtype = np.float64 if len(typed) < len(parts) else np.result_type(*dtypes)
+        return np.concatenate([part.astype(dtype) if part.dtype != object else np.full(len(part), np.nan) for part in parts])
+    return np.concatenate([part.astype(object) for part in parts])
+
+def fetch_columns(cursor, batch_size: int = 1000) -> dict:
+    '''Fetches every row of an executed cursor into a dict of column name: typed array. Each batch of *batch_size*
+    rows is split into columns and converted right away, so the rows of only one batch are alive at a time. Small
+    batches are faster here, the row tuples are reused while they are still in the CPU cache'''
+    names = [description[0] for description in cursor.description]
+    parts = [[] for _ in names]
+    while rows := cursor.fetchmany(batch_size):
+        for column, values in zip(parts, zip(*rows)):
+            column.append(column_array(values))
+    return {name: concatenate(column) for name, column in zip(names, parts)}
+
+def arrow_type(declared_type: str):
+    '''Arrow type for a declared SQLite column type, following the SQLite affinity rules. None for NUMERIC affinity
+    and columns without a type, whose values can be of any kind'''
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+        return pyarrow.int64()
+    if any(text in declared_type for text in ("CHAR", "CLOB", "TEXT")):
+        return pyarrow.string()
+    if "BLOB" in declared_type:
+        return pyarrow.binary()
+    if any(real in declared_type for real in ("REAL", "FLOA", "DOUB")):
+        return pyarrow.float64()
+    return None
+
+def record_batches(cursor, declared_types: dict = None, chunksize: int = 100000):
+    '''Yields an executed cursor as Arrow record batches of *chunksize* rows with the same schema. Column types come
+    from *declared_types* (column name: declared SQLite type) and the rest are inferred from the first batch'''
+    require_pyarrow()
+    names = [description[0] for description in cursor.description]
+    declared_types = declared_types or {}
+    types = [arrow_type(declared_types.get(name)) for name in names]
+    schema = None
+    while rows := cursor.fetchmany(chunksize):
+        columns = list(zip(*rows))
+        try:
+            if schema is None:
+                arrays = [pyarrow.array(values, type=kind) for values, kind in zip(columns, types)]
+                schema = pyarrow.schema([pyarrow.field(name, array.type if array.type != pyarrow.null() else pyarrow.string())
+                                         for name, array in zip(names, arrays)])
+            arrays = [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)]
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError) as e:
+            raise Exception(f"Error converting rows to Arrow, a column holds values of several types: {str(e)}")
+        yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+    if schema is None:  # No rows
+        yield pyarrow.RecordBatch.from_arrays([pyarrow.array([], type=kind or pyarrow.string()) for kind in types], names=names)
+
+def write_parquet(batches, path: str, compression: str = "snappy") -> int:
+    '''Streams record batches into a Parquet file, one row group per batch. Returns the number of rows written'''
+    require_pyarrow()
+    rows = 0
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, batch.schema, compression=compression)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def require_pyarrow():
+    if pyarrow is None:
+        raise ImportError("Arrow and Parquet output require the pyarrow package: pip install pyarrow")
@@ -0,0 +1,60 @@
+import os, time, hashlib
+
+class IngestManifest:
+    '''Table of the ingested source files with their size, mtime and content hash, kept in the target database. A file
+    is unchanged if its size and mtime match the manifest, or if they moved but its hash still matches (touched or
+    copied files). Only files that fail the cheap size/mtime check are hashed.'''
+
+    TABLE = "_ingest_manifest"
+
+    def __init__(self, conn, block_size: int = 1024 * 1024):
+        self.conn = conn
+        self.block_size = block_size
+        self.conn.execute(f'''CREATE TABLE IF NOT EXISTS {self.TABLE} (
+            source_path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT, ingested REAL);''')
+        self.conn.commit()
+
+    def check(self, source_path: str):
+        '''Returns (changed, fingerprint). The fingerprint (size, mtime_ns, hash) is what record() stores once the file
+        is ingested; its hash is None for new or resized files, record() hashes them'''
+        source_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+        row = self.conn.execute(f"SELECT size, mtime_ns, hash FROM {self.TABLE} WHERE source_path = ?",
+                                (source_path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return False, (stat.st_size, stat.st_mtime_ns, row[2])
+        if row is None or row[0] != stat.st_size:  # New or resized: changed for sure, hashed later by record()
+            return True, (stat.st_size, stat.st_mtime_ns, None)
+        digest = self.hash_file(source_path)
+        if digest == row[2]:  # Same content, only the mtime moved
+            self.record(source_path, (stat.st_size, stat.st_mtime_ns, digest))
+            return False, (stat.st_size, stat.st_mtime_ns, digest)
+        return True, (stat.st_size, stat.st_mtime_ns, digest)
+
+    def record(self, source_path: str, fingerprint):
+        '''Stores the fingerprint of an ingested file, hashing it if check() didn't have to'''
+        source_path = os.path.abspath(source_path)
+        size, mtime_ns, digest = fingerprint
+        digest = digest or self.hash_file(source_path)
+        self.conn.execute(f"INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?, ?, ?)",
+                          (source_path, size, mtime_ns, digest, time.time()))
+        self.conn.commit()
+
+    def forget(self, source_path: str = None):
+        '''Drops one file (or every file) from the manifest, so it is ingested again on the next run'''
+        if source_path is None:
+            self.conn.execute(f"DELETE FROM {self.TABLE}")
+        else:
+            self.conn.execute(f"DELETE FROM {self.TABLE} WHERE source_path = ?", (os.path.abspath(source_path),))
+        self.conn.commit()
+
+    def entries(self) -> list:
+        '''Rows of the manifest: (source_path, size, mtime_ns, hash, ingested)'''
+        return self.conn.execute(f"SELECT * FROM {self.TABLE} ORDER BY source_path").fetchall()
+
+    def hash_file(self, source_path: str) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(source_path, "rb") as f:
+            while block := f.read(self.block_size):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,225 @@
+import re, json, time, functools
+from collections import deque
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w\"])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+WHITESPACE = re.compile(r"\s+")
+
+class MemorySink:
+    '''Keeps the last *max_events* events and per-method aggregates in memory'''
+
+    def __init__(self, max_events: int = 10000):
+        self.events = deque(maxlen=max_events)
+        self.methods = {}
+
+    def emit(self, event: dict):
+        self.events.append(event)
+        if event["type"] == "method":
+            stats = self.methods.setdefault(event["name"], 
+                {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": 0, "changes": 0, "bytes": 0, "errors": 0})
+            stats["calls"] += 1
+            stats["wall_s"] += event["wall_s"]
+            stats["cpu_s"] += event["cpu_s"]
+            stats["rows"] += event["rows"] or 0
+            stats["changes"] += event["changes"] or 0
+            stats["bytes"] += event["bytes"] or 0
+            stats["errors"] += "error" in event
+
+    def stats(self) -> dict:
+        return {"methods": {name: dict(stats) for name, stats in self.methods.items()}}
+
+class JSONLinesSink:
+    '''Appends every event as a line of JSON to a file'''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+
+    def emit(self, event: dict):
+        self.file.write(json.dumps(event, default=str) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class CallbackSink:
+    '''Sends every event to a function'''
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, event: dict):
+        self.callback(event)
+
+def make_sink(sink):
+    '''"memory" (or None) for a MemorySink, a file path for a JSONLinesSink, a callable for a CallbackSink or any
+    object with an emit(event) method'''
+    if sink is None or sink == "memory":
+        return MemorySink()
+    if isinstance(sink, str):
+        return JSONLinesSink(sink)
+    if hasattr(sink, "emit"):
+        return sink
+    if callable(sink):
+        return CallbackSink(sink)
+    raise ValueError(f"Unsupported sink: {sink}. Try 'memory', a file path or a callable.")
+
+class Instrumentation:
+    '''Timing layer of a handler. The public methods of the handler are wrapped on the instance (the class is left
+    untouched, so nothing runs when it is detached) and every call emits a "method" event with wall and CPU time, the
+    rows it returned or the bytes it backed up, and the rows it changed. SQL statements are seen through the trace
+    callback of the connection: a statement is timed from its start to the start of the next one, the call of a
+    nested method or the end of the method (its fetches run in between), and the progress handler counts its virtual
+    machine steps. Statements run outside a wrapped method, e.g. on handler.cursor directly, aren't timed. Statements
+    are aggregated by their SQL with the literals stripped, and the ones slower than *slow_ms* are also emitted as
+    "slow_query" events.'''
+
+    def __init__(self, handler, sink="memory", slow_ms: float = 100, trace_sql: bool = True,
+                 progress_steps: int = 1000, max_statements: int = 1000):
+        self.handler = handler
+        self.sink = make_sink(sink)
+        self.slow_ms = slow_ms
+        self.trace_sql = trace_sql
+        self.progress_steps = progress_steps
+        self.max_statements = max_statements
+        self.statements = {}  # Normalized SQL: aggregates
+        self._keys = {}  # SQL as traced: normalized SQL
+        self.slow_queries = deque(maxlen=1000)
+        self.conn = None
+        self.wrapped = []
+        self._current = None  # (sql, start)
+        self._steps = 0
+        self._depth = 0  # Wrapped calls in progress
+
+    def attach(self):
+        '''Wraps the public methods of the handler and hooks its connection'''
+        for name in dir(type(self.handler)):
+            if name.startswith("_") or "instrumentation" in name:
+                continue
+            if isinstance(getattr(type(self.handler), name), property):
+                continue
+            method = getattr(self.handler, name)
+            if callable(method):
+                setattr(self.handler, name, self._wrap(name, method))
+                self.wrapped.append(name)
+        self._hook(self.handler.conn)
+
+    def detach(self):
+        '''Restores the methods of the handler and removes the connection hooks'''
+        for name in self.wrapped:
+            self.handler.__dict__.pop(name, None)
+        self.wrapped = []
+        self._unhook()
+        if hasattr(self.sink, "close"):
+            self.sink.close()
+
+    def stats(self) -> dict:
+        '''Statement aggregates, slow queries and (with a memory sink) method aggregates'''
+        stats = self.sink.stats() if hasattr(self.sink, "stats") else {}
+        stats["statements"] = {sql: dict(values) for sql, values in self.statements.items()}
+        stats["slow_queries"] = list(self.slow_queries)
+        return stats
+
+    def call(self, name, method, args, kwargs):
+        conn = self.handler.conn
+        try:
+            changes = conn.total_changes
+        except Exception:  # Closed connection
+            changes = None
+        wall, cpu = time.perf_counter(), time.process_time()
+        event = {"type": "method", "name": f"{type(self.handler).__name__}.{name}", "time": time.time()}
+        self._end_statement(wall)  # The caller's statement doesn't run on into this call
+        self._depth += 1
+        try:
+            result = method(*args, **kwargs)
+            event["rows"], event["bytes"] = self._result_size(result)
+            return result
+        except BaseException as e:
+            event["rows"], event["bytes"] = None, None
+            event["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._depth -= 1
+            self._end_statement(time.perf_counter())
+            event["wall_s"] = time.perf_counter() - wall
+            event["cpu_s"] = time.process_time() - cpu
+            try:
+                event["changes"] = conn.total_changes - changes
+            except Exception:  # Closed before or by the method
+                event["changes"] = None
+            if self.handler.conn is not self.conn:  # Reconnected
+                self._hook(self.handler.conn)
+            self.sink.emit(event)
+
+    """Internal methods"""
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            return self.call(name, method, args, kwargs)
+        return wrapper
+
+    def _hook(self, conn):
+        self._unhook()
+        self.conn = conn
+        if self.trace_sql:
+            conn.set_trace_callback(self._trace)
+            conn.set_progress_handler(self._progress, self.progress_steps)
+
+    def _unhook(self):
+        if self.conn is not None and self.trace_sql:
+            try:
+                self.conn.set_trace_callback(None)
+                self.conn.set_progress_handler(None, 0)
+            except Exception:  # Already closed
+                pass
+        self.conn = None
+
+    def _trace(self, sql):
+        now = time.perf_counter()
+        self._end_statement(now)
+        self._current = (sql, now) if self._depth else None  # Outside a method nothing would end it
+        self._steps = 0
+
+    def _progress(self):
+        self._steps += 1
+        return 0
+
+    def _end_statement(self, now):
+        if self._current is None:
+            return
+        sql, start = self._current
+        self._current = None
+        seconds = now - start
+        steps = self._steps * self.progress_steps
+        key = self._keys.get(sql)
+        if key is None:
+            key = LITERALS.sub("?", sql)
+            if "\n" in key or "  " in key:
+                key = WHITESPACE.sub(" ", key).strip()
+            if len(self._keys) < 10000:
+                self._keys[sql] = key
+        stats = self.statements.get(key)
+        if stats is None:
+            if len(self.statements) >= self.max_statements:
+                key = "(other statements)"
+                stats = self.statements.setdefault(key, {"count": 0, "total_s": 0.0, "max_s": 0.0, "vm_steps": 0})
+            else:
+                stats = self.statements[key] = {"count": 0, "total_s": 0.0, "max_s": 0.0, "vm_steps": 0}
+        stats["count"] += 1
+        stats["total_s"] += seconds
+        stats["max_s"] = max(stats["max_s"], seconds)
+        stats["vm_steps"] += steps
+        if self.slow_ms is not None and seconds * 1000 >= self.slow_ms:
+            event = {"type": "slow_query", "sql": sql[:1000], "seconds": seconds, "vm_steps": steps, "time": time.time()}
+            self.slow_queries.append(event)
+            self.sink.emit(event)
+
+    def _result_size(self, result):
+        '''(rows, bytes) of a method result: the length of a dataframe or list, or the counters of a result dict'''
+        if isinstance(result, dict):
+            rows = result.get("rows", result.get("deleted"))
+            return (rows if isinstance(rows, int) else None), result.get("bytes")
+        if isinstance(result, (list, tuple)) or hasattr(result, "shape"):
+            return len(result), None
+        if isinstance(result, int) and not isinstance(result, bool):
+            return result, None
+        return None, None
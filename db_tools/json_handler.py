@@ -1,5 +1,6 @@
-import os, re, json, sqlite3
-from db_tools import SQLite_Handler
+import os, re, json, time, sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from .sqlite_handler import SQLite_Handler
 
 class JSONhandler(SQLite_Handler):
     def __init__(self, db_name, rel_path=None):
@@ -24,8 +25,7 @@ class JSONhandler(SQLite_Handler):
             self.cursor.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" (filename TEXT);')
 
             # Get existing columns
-            self.cursor.execute(f'PRAGMA table_info("{table_name}")')
-            existing_columns = {row[1] for row in self.cursor.fetchall()}
+            existing_columns = set(self.catalog.columns(table_name))
 
             # Add missing columns
             for key, value in metadata.items():
@@ -66,8 +66,11 @@ class JSONhandler(SQLite_Handler):
         except sqlite3.Error as e:
             print(f"Error inserting into table {table_name}: {e}")
 
-    def process_jsons(self, folder_path):
-            """Process all JSON files in a directory and insert their metadata into the database."""
+    def process_jsons(self, folder_path, batched=False, workers=None, batch_size=5000):
+            """Process all JSON files in a directory and insert their metadata into the database. With batched=True the 
+            files are parsed in a pool of *workers* processes and written *batch_size* files per transaction."""
+            if batched:
+                return self._process_jsons_batched(folder_path, workers, batch_size)
             for root, _, files in os.walk(folder_path):
                 for file in files:
                     if file.endswith(".json"):
@@ -88,3 +91,96 @@ class JSONhandler(SQLite_Handler):
                         
                         # Optionally, delete the JSON file after processing it
                         os.remove(json_path)
+
+    def _process_jsons_batched(self, folder_path, workers=None, batch_size=5000):
+        """Batched version of process_jsons. The schema of every table is merged in memory against the catalog columns, 
+        new columns are added once and the rows are inserted with executemany. Files are deleted after their batch is 
+        committed. Returns the number of files processed."""
+        sources = [(os.path.join(root, file), os.path.basename(root)) 
+                   for root, _, files in os.walk(folder_path) for file in files if file.endswith(".json")]
+        processed = 0
+        start = time.perf_counter()
+        executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+        try:
+            paths = [json_path for json_path, _ in sources]
+            records = executor.map(_load_json_metadata, paths, chunksize=64) if executor else map(_load_json_metadata, paths)
+            batch = []
+            for (json_path, parent_folder), metadata in zip(sources, records):
+                batch.append((json_path, self._sanitize_table_name(parent_folder), metadata))
+                if len(batch) >= batch_size:
+                    processed += self._write_json_batch(batch)
+                    batch = []
+            if batch:
+                processed += self._write_json_batch(batch)
+        finally:
+            if executor:
+                executor.shutdown()
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed > 0 else float("inf")
+        print(f"{processed} JSON file(s) processed in {elapsed:.3f}s ({rate:,.0f} files/s)")
+        return processed
+
+    def _write_json_batch(self, batch):
+        """Writes a batch of parsed JSON files in a single transaction"""
+        tables = {}
+        for _, table_name, metadata in batch:
+            tables.setdefault(table_name, []).append(metadata)
+        try:
+            self.conn.commit()
+            self.cursor.execute("BEGIN")  # The CREATE and ALTER statements are rolled back with the rows
+            for table_name, rows in tables.items():
+                if not self.catalog.has_table(table_name):
+                    self.cursor.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" (filename TEXT);')
+                # SQLite column names are case-insensitive (ASCII only), keys are mapped to the existing spelling
+                existing_columns = {_fold(column): column for column in self.catalog.columns(table_name)}
+                new_columns = {}  # Merged schema of the batch, typed by the first non null value
+                for metadata in rows:
+                    for key, value in metadata.items():
+                        folded = _fold(key)
+                        if folded in existing_columns:
+                            continue
+                        spelling, first_value = new_columns.get(folded, (key, None))
+                        if first_value is None:
+                            new_columns[folded] = (spelling, value)
+                for folded, (key, value) in new_columns.items():
+                    if isinstance(value, int):
+                        dtype = "INTEGER"
+                    elif isinstance(value, float):
+                        dtype = "REAL"
+                    else:
+                        dtype = "TEXT"
+                    self.cursor.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{key}" {dtype};')
+                    existing_columns[folded] = key
+                columns = list(dict.fromkeys(existing_columns[_fold(key)] for metadata in rows for key in metadata))
+                column_names = ", ".join([f'"{column}"' for column in columns])
+                placeholders = ", ".join(["?" for _ in columns])
+                self.cursor.executemany(
+                    f'INSERT OR IGNORE INTO "{table_name}" ({column_names}) VALUES ({placeholders});',
+                    ([row.get(column) for column in columns] 
+                     for row in ({existing_columns[_fold(key)]: value for key, value in metadata.items()} for metadata in rows))
+                )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            raise Exception(f"Error inserting JSON batch: {str(e)}")
+        for json_path, _, _ in batch:  # Only once the batch is committed
+            os.remove(json_path)
+        return len(batch)
+
+def _fold(name):
+    """Column name as SQLite compares it: case-insensitive for ASCII letters only"""
+    return name.translate(_ASCII_LOWER)
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def _load_json_metadata(json_path):
+    """Reads a JSON file and prepares it as a row, like process_jsons does. Kept at module level for the worker processes"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data["filename"] = os.path.basename(json_path).split(".")[0]
+    if isinstance(data.get("tags"), list):
+        data["tags"] = ";".join(data["tags"])
+    for key in data:
+        if isinstance(data[key], (list, dict)):
+            data[key] = json.dumps(data[key], ensure_ascii=False)
+    return data
@@ -1,5 +1,5 @@
-import sqlite3
-from sqlite_handler import SQLite_Handler
+import sqlite3, time, re
+from .sqlite_handler import SQLite_Handler
 
 class QueryBuilder(SQLite_Handler):
     def __init__(self, db_name, db_folder_path=None, rel_path=False):
@@ -29,17 +29,20 @@ class QueryBuilder(SQLite_Handler):
         columns_str = ", ".join(column_defs)
         return f"CREATE TABLE {self.table_name} ({columns_str});"
 
-    def migrate_table(self, table_name: str, foreign_key: str=None, verbose: bool=True):
-        '''Creates a copy of a table and deletes it, allowing for foreign keys set'''
+    def migrate_table(self, table_name: str, foreign_key: str=None, verbose: bool=True, online: bool=False, 
+        batch_size: int=50000):
+        '''Creates a copy of a table and deletes it, allowing for foreign keys set. With online=True the rows are 
+        copied in rowid batches of *batch_size*, each in its own short transaction, so writers are not blocked for 
+        the whole copy and an interrupted migration resumes where it stopped when called again'''
+        if online:
+            return self._migrate_table_online(table_name, foreign_key, batch_size, verbose)
         try:
             # Create temporal name
             temp_name = f"{table_name}_old"
             # Rename source table to temporal name
             self.cursor.execute(f"ALTER TABLE {table_name} RENAME TO {temp_name};")
-            # Get source table info
-            self.cursor.execute(f"PRAGMA table_info({temp_name});")
             # Get source columns
-            old_columns = [row[1] for row in self.cursor.fetchall()]
+            old_columns = self.catalog.columns(temp_name)
             # Get query with old columns
             data = {
                 "table_name": table_name,
@@ -50,10 +53,8 @@ class QueryBuilder(SQLite_Handler):
             query = query_builder.create_table()
             # Create new table
             self.cursor.execute(query)
-            # Get target table info
-            self.cursor.execute(f"PRAGMA table_info({table_name});")
             # Get new columns info
-            new_columns = [row[1] for row in self.cursor.fetchall()]
+            new_columns = self.catalog.columns(table_name)
             # Prepare columns
             common_columns = list(set(old_columns) & set(new_columns))
             columns_str = ", ".join(common_columns)
@@ -67,52 +68,301 @@ class QueryBuilder(SQLite_Handler):
         except Exception as e:
             raise Exception(f"Error while migrating table: {str(e)}")
 
+    def migration_status(self, table_name: str = None) -> list:
+        '''Rows of the migration state table: (table_name, new_table, last_rowid, rows_copied, started)'''
+        if not self.catalog.has_table("_migration_state"):
+            return []
+        query = "SELECT table_name, new_table, last_rowid, rows_copied, started FROM _migration_state"
+        if table_name is not None:
+            return self.cursor.execute(query + " WHERE table_name = ?", (table_name,)).fetchall()
+        return self.cursor.execute(query).fetchall()
+
     def filter_rows_by_tags(self,
         table_name: str,
         column_name: str,
         whitelist: list = None,
-        blacklist: list = None
+        blacklist: list = None,
+        use_index: bool = None
     ) -> list:
         """Query a table with a comma-separated column, combining multiple inclusion/exclusion conditions.
         Args:
             table_name: Name of the table to query
             column_name: Column containing comma-separated values
-            required_values: List of values that MUST be present
-            excluded_values: List of values that MUST NOT be present
+            whitelist: List of values that MUST be present
+            blacklist: List of values that MUST NOT be present
+            use_index: Answer with the tag index (see create_tag_index). By default it is used if it exists. The scan 
+                matches with LIKE, so it ignores ASCII case and treats % and _ in the values as wildcards, while 
+                the index matches tags exactly: the two can return different rows for such values
         Returns:
             List of matching rows"""
+        if use_index is None:
+            use_index = self._tag_index_exists(table_name, column_name)
+        if use_index:
+            return self._filter_rows_by_tag_index(table_name, column_name, whitelist, blacklist)
         conditions = []
         params = []
         # Add required values (AND conditions)
         if whitelist:
             for val in whitelist:
-                conditions.extend([
+                conditions.append(" OR ".join([
                     f"({column_name} = ?)",
                     f"({column_name} LIKE ?)",
                     f"({column_name} LIKE ?)",
                     f"({column_name} LIKE ?)"
-                ])
+                ]))
                 params += [val, f"{val},%", f"%,{val}", f"%,{val},%"]
         # Add excluded values (AND NOT conditions)
         if blacklist:
             for val in blacklist:
-                conditions.extend([
+                conditions.append(f"{column_name} IS NULL OR (" + " AND ".join([
                     f"({column_name} != ?)",
                     f"({column_name} NOT LIKE ?)",
                     f"({column_name} NOT LIKE ?)",
                     f"({column_name} NOT LIKE ?)"
-                ])
+                ]) + ")")
                 params += [val, f"{val},%", f"%,{val}", f"%,{val},%"]
         # Build final query
         query = f"SELECT * FROM {table_name}"
         if conditions:
-            query += " WHERE " + " AND ".join([f"({' OR '.join(conditions[i:i+4])})" 
-                    for i in range(0, len(conditions), 4)])
+            query += " WHERE " + " AND ".join([f"({condition})" for condition in conditions])
         # Execute safely with parameter substitution
-        self.cursor.execute(query, params)
-        rows = self.cursor.fetchall()
+        rows = self._cached(query, params, lambda: self.cursor.execute(query, params).fetchall())
         return rows
 
+    def create_tag_index(self, table_name: str, column_name: str, sep: str = ",", verbose: bool = True):
+        '''Builds a normalized (row_id, tag) side table for a separated-values column and keeps it in sync with 
+        triggers, so filter_rows_by_tags answers with index lookups instead of scanning the table. Tags are matched 
+        exactly (case-sensitive, no wildcards), unlike the LIKE scan. Requires a rowid table'''
+        if not sep:
+            raise ValueError("The separator can't be empty")
+        index_table = self._tag_index_name(table_name, column_name)
+        try:
+            self.conn.commit()
+            self.cursor.execute("BEGIN")
+            self.cursor.execute(f'DROP TABLE IF EXISTS "{index_table}";')
+            self.cursor.execute(f'''CREATE TABLE "{index_table}" (
+                row_id INTEGER NOT NULL, tag TEXT NOT NULL, PRIMARY KEY (tag, row_id)) WITHOUT ROWID;''')
+            self.cursor.execute(f'CREATE INDEX "{index_table}_row_id" ON "{index_table}" (row_id);')
+            self.cursor.execute(f'''INSERT OR IGNORE INTO "{index_table}" (row_id, tag) SELECT row_id, tag FROM (
+                {self._split_tags_sql("rowid", f'"{column_name}"', sep, f'FROM "{table_name}" WHERE "{column_name}" IS NOT NULL')});''')
+            new_tags = self._split_tags_sql("NEW.rowid", f'NEW."{column_name}"', sep, f'WHERE NEW."{column_name}" IS NOT NULL')
+            # INSERT OR REPLACE fires no DELETE trigger for the row it replaces, so the insert clears the rowid first
+            self.cursor.execute(f'''CREATE TRIGGER "{index_table}_insert" AFTER INSERT ON "{table_name}" BEGIN
+                    DELETE FROM "{index_table}" WHERE row_id = NEW.rowid;
+                    INSERT OR IGNORE INTO "{index_table}" (row_id, tag) SELECT row_id, tag FROM ({new_tags});
+                END;''')
+            self.cursor.execute(f'''CREATE TRIGGER "{index_table}_update" AFTER UPDATE ON "{table_name}"
+                WHEN OLD."{column_name}" IS NOT NEW."{column_name}" OR OLD.rowid != NEW.rowid BEGIN
+                    DELETE FROM "{index_table}" WHERE row_id = OLD.rowid;
+                    INSERT OR IGNORE INTO "{index_table}" (row_id, tag) SELECT row_id, tag FROM ({new_tags});
+                END;''')
+            self.cursor.execute(f'''CREATE TRIGGER "{index_table}_delete" AFTER DELETE ON "{table_name}" BEGIN
+                    DELETE FROM "{index_table}" WHERE row_id = OLD.rowid;
+                END;''')
+            self.conn.commit()
+            print(f"Tag index *{index_table}* created for *{table_name}.{column_name}*") if verbose else None
+        except Exception as e:
+            self.conn.rollback()
+            raise Exception(f"Error while creating tag index: {str(e)}")
+
+    def drop_tag_index(self, table_name: str, column_name: str, verbose: bool = True):
+        '''Drops the tag index of a column and its triggers'''
+        index_table = self._tag_index_name(table_name, column_name)
+        try:
+            for trigger in ("insert", "update", "delete"):
+                self.cursor.execute(f'DROP TRIGGER IF EXISTS "{index_table}_{trigger}";')
+            self.cursor.execute(f'DROP TABLE IF EXISTS "{index_table}";')
+            self.conn.commit()
+            print(f"Tag index *{index_table}* dropped") if verbose else None
+        except Exception as e:
+            raise Exception(f"Error while dropping tag index: {str(e)}")
+
+    def _filter_rows_by_tag_index(self, table_name, column_name, whitelist=None, blacklist=None) -> list:
+        '''filter_rows_by_tags answered with set operations on the tag index'''
+        index_table = self._tag_index_name(table_name, column_name)
+        if not self._tag_index_exists(table_name, column_name):
+            raise ValueError(f"No tag index in sync with *{table_name}.{column_name}*: build it with create_tag_index")
+        conditions = []
+        params = []
+        if whitelist:  # Rows holding every whitelisted tag
+            tags = list(dict.fromkeys(whitelist))
+            conditions.append(f'''rowid IN (SELECT row_id FROM "{index_table}" WHERE tag IN ({", ".join("?" for _ in tags)})
+                GROUP BY row_id HAVING COUNT(*) = {len(tags)})''')
+            params += tags
+        if blacklist:  # Minus rows holding any blacklisted tag
+            tags = list(dict.fromkeys(blacklist))
+            conditions.append(f'rowid NOT IN (SELECT row_id FROM "{index_table}" WHERE tag IN ({", ".join("?" for _ in tags)}))')
+            params += tags
+        query = f'SELECT * FROM "{table_name}"'
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY rowid"
+        return self._cached(query, params, lambda: self.cursor.execute(query, params).fetchall())
+
+    def _migrate_table_online(self, table_name, foreign_key=None, batch_size=50000, verbose=True) -> dict:
+        '''Online migrate_table: shadow table kept in sync by triggers, batched copy with its progress in 
+        _migration_state, then a swap in one transaction'''
+        new_table = f"{table_name}__migrating"
+        try:
+            self.conn.commit()
+            self.cursor.execute('''CREATE TABLE IF NOT EXISTS _migration_state (
+                table_name TEXT PRIMARY KEY, new_table TEXT, last_rowid INTEGER, rows_copied INTEGER, started REAL);''')
+            state = self.cursor.execute("SELECT last_rowid, rows_copied FROM _migration_state WHERE table_name = ?", 
+                (table_name,)).fetchone()
+            if state is None:
+                self._start_online_migration(table_name, new_table, foreign_key)
+                last_rowid, copied = 0, 0
+            else:
+                last_rowid, copied = state
+                print(f"Resuming migration of *{table_name}* after rowid {last_rowid}") if verbose else None
+            columns = ", ".join(f'"{column}"' for column in self.catalog.columns(new_table) 
+                if column in self.catalog.columns(table_name))
+            total = self.estimate_row_count(table_name)
+            start = time.perf_counter()
+            copied_now = 0
+            while True:
+                self.cursor.execute("BEGIN IMMEDIATE")
+                upper = self.cursor.execute(f'''SELECT max(rowid) FROM (SELECT rowid FROM "{table_name}" 
+                    WHERE rowid > ? ORDER BY rowid LIMIT ?)''', (last_rowid, batch_size)).fetchone()[0]
+                if upper is None:
+                    self.conn.commit()
+                    break
+                self.cursor.execute(f'''INSERT OR REPLACE INTO "{new_table}" (rowid, {columns}) 
+                    SELECT rowid, {columns} FROM "{table_name}" WHERE rowid > ? AND rowid <= ?''', (last_rowid, upper))
+                copied_now += self.cursor.rowcount
+                last_rowid = upper
+                self.cursor.execute("UPDATE _migration_state SET last_rowid = ?, rows_copied = ? WHERE table_name = ?", 
+                    (last_rowid, copied + copied_now, table_name))
+                self.conn.commit()
+                rate = copied_now / max(time.perf_counter() - start, 1e-9)
+                print(f"    {copied + copied_now}/~{total} rows copied ({rate:.0f} rows/s)") if verbose else None
+            self._swap_online_migration(table_name, new_table)
+        except Exception as e:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise Exception(f"Error while migrating table: {str(e)}")
+        seconds = time.perf_counter() - start
+        print(f"Foreign key set as *{foreign_key}*") if isinstance(foreign_key, str) and verbose else None
+        print(f"Table *{table_name}* migrated successfully.") if verbose else None
+        return {"rows": copied + copied_now, "seconds": seconds, "rows_s": copied_now / max(seconds, 1e-9)}
+
+    def _start_online_migration(self, table_name, new_table, foreign_key):
+        '''Creates the new table and the triggers that mirror every write on the old one into it'''
+        if not self._has_rowid(table_name):
+            raise ValueError(f"Online migration needs a rowid table, *{table_name}* is WITHOUT ROWID")
+        info = self.catalog.table_info(table_name)
+        ddl = self._migration_ddl(table_name, new_table, [foreign_key] if isinstance(foreign_key, str) else (foreign_key or []))
+        columns = ", ".join(f'"{row[1]}"' for row in info)
+        new_values = ", ".join(f'NEW."{row[1]}"' for row in info)
+        self.cursor.execute("BEGIN IMMEDIATE")
+        self.cursor.execute(f'DROP TABLE IF EXISTS "{new_table}";')
+        self.cursor.execute(ddl)
+        self.cursor.execute(f'''CREATE TRIGGER "{new_table}_insert" AFTER INSERT ON "{table_name}" BEGIN
+                INSERT OR REPLACE INTO "{new_table}" (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+            END;''')
+        self.cursor.execute(f'''CREATE TRIGGER "{new_table}_update" AFTER UPDATE ON "{table_name}" BEGIN
+                DELETE FROM "{new_table}" WHERE rowid = OLD.rowid;
+                INSERT OR REPLACE INTO "{new_table}" (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+            END;''')
+        self.cursor.execute(f'''CREATE TRIGGER "{new_table}_delete" AFTER DELETE ON "{table_name}" BEGIN
+                DELETE FROM "{new_table}" WHERE rowid = OLD.rowid;
+            END;''')
+        self.cursor.execute("INSERT INTO _migration_state VALUES (?, ?, 0, 0, ?)", (table_name, new_table, time.time()))
+        self.conn.commit()
+
+    def _migration_ddl(self, table_name, new_table, foreign_keys) -> str:
+        '''CREATE TABLE of the new table: the original statement from sqlite_master, so every column and table 
+        constraint is kept, renamed and with a FOREIGN KEY clause added for each of *foreign_keys* (referencing 
+        the plural table as create_table does) that doesn't have one yet'''
+        row = self.cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+        if row is None or not row[0]:
+            raise ValueError(f"Table *{table_name}* not found or without a CREATE TABLE statement")
+        sql = row[0]
+        header = re.match(r'\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|[^\s(."`\[]+)'
+                          r'(?:\s*\.\s*(?:"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|[^\s(."`\[]+))?\s*\(', sql, re.IGNORECASE)
+        end = self._closing_paren(sql, header.end() - 1) if header else None
+        if end is None:
+            raise ValueError(f"Can't parse the CREATE TABLE statement of *{table_name}*, migrate it offline")
+        clauses = []
+        for key in foreign_keys:
+            if re.search(rf'FOREIGN\s+KEY\s*\(\s*["`\[]?{re.escape(key)}["`\]]?\s*\)', sql, re.IGNORECASE):
+                print(f"*{table_name}* already has a foreign key on *{key}*, kept as it is")
+                continue
+            clauses.append(f'FOREIGN KEY("{key}") REFERENCES {key.rstrip("_id") + "s"}(id)')
+        body = sql[header.end():end] + "".join(f", {clause}" for clause in clauses)
+        quoted_name = new_table.replace('"', '""')
+        return f'CREATE TABLE "{quoted_name}" ({body}){sql[end + 1:]}'
+
+    def _closing_paren(self, sql, start):
+        '''Position of the parenthesis closing the one at *start*, skipping quoted names, strings and comments'''
+        depth = 0
+        i = start
+        while i < len(sql):
+            char = sql[i]
+            if char in "'\"`[":
+                close = "]" if char == "[" else char
+                i = sql.find(close, i + 1)
+                while i != -1 and close != "]" and sql[i + 1:i + 2] == close:  # Doubled quote
+                    i = sql.find(close, i + 2)
+                if i == -1:
+                    return None
+            elif sql.startswith("--", i):
+                i = sql.find("\n", i)
+                if i == -1:
+                    return None
+            elif sql.startswith("/*", i):
+                i = sql.find("*/", i)
+                if i == -1:
+                    return None
+                i += 1
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth == 0:
+                    return i
+            i += 1
+        return None
+
+    def _swap_online_migration(self, table_name, new_table):
+        '''Replaces the old table with the new one in a single transaction, keeping its indexes and triggers'''
+        self.cursor.execute("BEGIN IMMEDIATE")
+        for trigger in ("insert", "update", "delete"):
+            self.cursor.execute(f'DROP TRIGGER IF EXISTS "{new_table}_{trigger}";')
+        schema = [row[0] for row in self.cursor.execute('''SELECT sql FROM sqlite_master 
+            WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL ORDER BY type''', (table_name,))]
+        self.cursor.execute(f'DROP TABLE "{table_name}";')
+        self.cursor.execute(f'ALTER TABLE "{new_table}" RENAME TO "{table_name}";')
+        for sql in schema:
+            self.cursor.execute(sql)
+        self.cursor.execute("DELETE FROM _migration_state WHERE table_name = ?", (table_name,))
+        self.conn.commit()
+
+    def _tag_index_name(self, table_name: str, column_name: str) -> str:
+        return f"{table_name}__{column_name}__tags"
+
+    def _tag_index_exists(self, table_name: str, column_name: str) -> bool:
+        '''True if the side table and its three triggers on the table exist. Dropping the table (as a replace by 
+        store does) drops the triggers but leaves the side table, which is then stale'''
+        index_table = self._tag_index_name(table_name, column_name)
+        if not self.catalog.has_table(index_table):
+            return False
+        triggers = self.cursor.execute("""SELECT count(*) FROM sqlite_master WHERE type = 'trigger' 
+            AND lower(tbl_name) = lower(?) AND name IN (?, ?, ?)""", 
+            (table_name, *(f"{index_table}_{trigger}" for trigger in ("insert", "update", "delete")))).fetchone()[0]
+        return triggers == 3
+
+    def _split_tags_sql(self, row_id: str, value: str, sep: str, source: str = "") -> str:
+        '''SELECT of the (row_id, tag) pairs of a separated-values column, split with a recursive CTE on instr and 
+        substr so any character can be part of a tag. *source* is the FROM/WHERE the rows come from. Triggers don't 
+        accept a WITH statement, so it has to be used as a subquery'''
+        sep = sep.replace("'", "''")
+        return f'''WITH RECURSIVE split(row_id, tag, rest) AS (
+                    SELECT {row_id}, NULL, CAST({value} AS TEXT) || '{sep}' {source}
+                    UNION ALL SELECT row_id, substr(rest, 1, instr(rest, '{sep}') - 1), 
+                        substr(rest, instr(rest, '{sep}') + length('{sep}')) FROM split WHERE rest != '')
+                SELECT row_id, tag FROM split WHERE tag IS NOT NULL'''
+
     def _check_requirements(self, name: str, value, expected_type=None) -> bool:
         '''Checks if a value exists and matches an expected type'''
         if value is None:
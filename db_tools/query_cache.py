@@ -0,0 +1,84 @@
+import re, sys
+from collections import OrderedDict
+
+class QueryCache:
+    '''LRU cache of query results bounded by entries and bytes. Keys are the normalized SQL plus its parameters. The 
+    whole cache is dropped when PRAGMA data_version (commits from other connections or processes), PRAGMA 
+    schema_version or the total changes of the own connection move.'''
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key: (value, size)
+        self.bytes = 0
+        self.token = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def validate(self, conn):
+        '''Clears the cache if the database changed since the last lookup'''
+        token = (conn.execute("PRAGMA data_version").fetchone()[0], 
+                 conn.execute("PRAGMA schema_version").fetchone()[0], 
+                 conn.total_changes)
+        if token != self.token:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.token = token
+
+    def key(self, sql: str, params=(), variant=None):
+        '''Cache key: SQL with collapsed whitespace, its parameters and any option changing the result. Lists in the 
+        parameters or the variant (e.g. index_col=["a", "b"]) are turned into tuples so the key is hashable'''
+        return (re.sub(r"\s+", " ", sql).strip(), _hashable(tuple(params)), _hashable(variant))
+
+    def get(self, key):
+        '''Returns the cached value or None, counting the hit or miss'''
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        '''Stores a value, evicting the least recently used entries to respect the limits'''
+        size = _size_of(value)
+        if size > self.max_bytes:  # Would evict everything else
+            return
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses, 
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    return value
+
+def _size_of(value) -> int:
+    '''Approximate memory used by a dataframe or a list of row tuples'''
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    size = sys.getsizeof(value)
+    for row in value:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(item) for item in row)
+    return size
@@ -0,0 +1,56 @@
+class SchemaCatalog:
+    '''In-memory copy of the table, column and index metadata of a connection. Every table is read from the PRAGMAs 
+    the first time it is looked up and served from memory afterwards. Everything is dropped when PRAGMA 
+    schema_version changes, which SQLite bumps on any schema change from any connection.'''
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.schema_version = None
+        self._tables = None  # Lowercase name: name
+        self._table_info = {}
+        self._indexes = {}
+
+    def refresh(self, force: bool = False):
+        '''Drops the cached metadata if the schema changed (or always, with force=True)'''
+        schema_version = self.conn.execute("PRAGMA schema_version").fetchone()[0]
+        if force or schema_version != self.schema_version:
+            self.schema_version = schema_version
+            self._tables = None
+            self._table_info.clear()
+            self._indexes.clear()
+
+    def tables(self) -> list:
+        '''Names of the tables of the database'''
+        self.refresh()
+        if self._tables is None:
+            rows = self.conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name").fetchall()
+            self._tables = {row[0].lower(): row[0] for row in rows}
+        return list(self._tables.values())
+
+    def has_table(self, table_name: str) -> bool:
+        self.tables()
+        return table_name.lower() in self._tables
+
+    def table_info(self, table_name: str) -> list:
+        '''Rows of PRAGMA table_info: (cid, name, type, notnull, dflt_value, pk)'''
+        self.refresh()
+        key = table_name.lower()
+        if key not in self._table_info:
+            self._table_info[key] = self.conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+        return self._table_info[key]
+
+    def columns(self, table_name: str) -> list:
+        '''Column names of a table, in order'''
+        return [row[1] for row in self.table_info(table_name)]
+
+    def indexes(self, table_name: str) -> list:
+        '''(name, unique, columns) of every index of a table'''
+        self.refresh()
+        key = table_name.lower()
+        if key not in self._indexes:
+            indexes = []
+            for row in self.conn.execute(f'PRAGMA index_list("{table_name}")').fetchall():
+                columns = [info[2] for info in self.conn.execute(f'PRAGMA index_info("{row[1]}")').fetchall()]
+                indexes.append((row[1], bool(row[2]), columns))
+            self._indexes[key] = indexes
+        return self._indexes[key]
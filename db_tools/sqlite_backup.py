@@ -1,13 +1,33 @@
-import os, json, time, shutil, sqlite3
-from sqlite_handler import SQLite_Handler
+import os, re, json, time, shutil, sqlite3, hashlib, struct, lzma, tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from .sqlite_handler import SQLite_Handler
+try: # Optional dependency: pip install zstandard
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSED_EXTENSIONS = {"lzma": ".xz", "zstd": ".zst"}
+LOCK_PAGE_OFFSET = 0x40000000  # Byte range SQLite locks on Windows, a database bigger than this one holds it
 
 class SQLite_Backup(SQLite_Handler):
     '''Automatic backup generator. Every time it runs it checks for an absolute 
     time condition comparing a .json file data with the specified backup time.'''
     
-    def __init__(self, db_name: str, backup_folder=None, backup_time=None, db_folder_path: str = None, rel_path: bool = False):
+    def __init__(self, db_name: str, backup_folder=None, backup_time=None, db_folder_path: str = None, rel_path: bool = False,
+                 engine: str = None, pages: int = None, sleep: float = None, progress=None):
         # Call the parent class constructor to use its path logic
         super().__init__(db_name, db_folder_path, rel_path)
+        # Backup engine rules, set before the first check so it already uses them
+        self.engine = "copy"
+        self.pages = 1024
+        self.sleep = 0.005
+        self.progress = None
+        self.max_restarts = 3
+        self.block_pages = 16
+        self.max_chain = 30
+        self.compression = None
+        self.set_backup_rules(engine, pages, sleep, progress)
         
         # Setup backup folder
         if backup_folder is None:
@@ -115,18 +135,18 @@ class SQLite_Backup(SQLite_Handler):
             return
             
         self.date, self.date_format = self._get_date(time.localtime())
-        data = {
+        data.update({ # Keeps the incremental backup state
             "database": database,
             "filename": filename,
             "date": self.date,
             "date_format": self.date_format
-        }
+        })
         
         with open(self.json_path, "w") as json_file:
             json.dump(data, json_file)
             
         print(f"Checkpoint *{filename}* created for *{database}* at *{self.date_format}*")
-        self._backup(db_path)
+        return self._backup(db_path)
     
     def check_backup(self, db_name):
         '''Quick auto-backup check'''
@@ -160,6 +180,136 @@ class SQLite_Backup(SQLite_Handler):
         print(f"Backup time period: {self._format_time(self.backup_time)} HH:MM:SS")
         self._auto_backup(db_path)
 
+    def time_to_backup(self):
+        '''Seconds left until the next auto-backup according to the checkpoint (0 or less when due). Returns None if the 
+        backup is disabled or there is no checkpoint'''
+        if self.backup_time == -1 or not os.path.exists(self.json_path):
+            return None
+        with open(self.json_path, "r") as json_file:
+            json_date = json.load(json_file)["date"]
+        current_time, _ = self._get_date(time.localtime())
+        return self.backup_time - (current_time - json_date)
+
+    def prune_backups(self, keep: int, verbose=True):
+        '''Deletes the oldest backups of the database, keeping the newest *keep* restore points: every full backup 
+        and every delta of an incremental chain counts as one. The files a kept delta is rebuilt from (its base and the 
+        earlier deltas of its chain) and the current chain are kept too. Returns the deleted names'''
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+        try:
+            with open(self.json_path, "r") as json_file:
+                state = json.load(json_file).get("incremental") or {}
+        except (FileNotFoundError, ValueError):
+            state = {}
+        names = self.list_backups()
+        current = state["chain"][-1] if state.get("chain") else state.get("base")
+        needed = set()
+        for name in names[:keep] + ([current] if current in names else []):
+            while name not in needed: # The link and everything it is rebuilt from
+                needed.add(name)
+                if not name.lower().endswith(".delta"):
+                    break
+                name = self._read_delta_header(os.path.join(self.backup_folder, name))["parent"]
+        expired = [name for name in names if name not in needed]
+        for name in expired:
+            os.remove(os.path.join(self.backup_folder, name))
+            if os.path.exists(os.path.join(self.backup_folder, name + ".hashes")):
+                os.remove(os.path.join(self.backup_folder, name + ".hashes"))
+            print(f"Backup *{name}* pruned") if verbose else None
+        return expired
+
+    def list_backups(self) -> list:
+        '''Names of the backups of the database in the backup folder, newest first'''
+        full, deltas = self._backup_names()
+        return sorted(full + deltas, key=self._backup_date, reverse=True)
+
+    def open_snapshot(self, backup_name, mmap_size: int = 1 << 30):
+        '''Opens a .db backup of the backup folder in place, as a read-only connection, to query an old state without 
+        restoring it. The file is opened as immutable, so SQLite takes no locks and reads it through a memory map of 
+        up to *mmap_size* bytes. Compressed and .delta backups can't be opened in place, restore them first with 
+        promote(db_name=...) into another database'''
+        conn = sqlite3.connect(self._snapshot_uri(backup_name), uri=True)
+        conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}").fetchall()
+        return conn
+
+    def attach_snapshots(self, backup_names, live: bool = False, mmap_size: int = 1 << 30):
+        '''Attaches several .db backups read-only (as in open_snapshot) to one new connection, to query and diff 
+        across them, e.g. SELECT * FROM snapshot_1.t EXCEPT SELECT * FROM snapshot_2.t. *backup_names* is a list, 
+        attached as snapshot_1, snapshot_2... in order, or a dict of schema name: backup name. With live=True the 
+        current database is also attached read-only as "live". Returns the connection'''
+        if isinstance(backup_names, str):
+            backup_names = [backup_names]
+        if not isinstance(backup_names, dict):
+            backup_names = {f"snapshot_{i}": name for i, name in enumerate(backup_names, start=1)}
+        if live and self.db_path == ":memory:":
+            raise ValueError("An in-memory database can't be attached to another connection")
+        uris = {alias: self._snapshot_uri(name) for alias, name in backup_names.items()}  # Checks them all first
+        if live:
+            uris["live"] = f"{Path(os.path.abspath(self.db_path)).as_uri()}?mode=ro"
+        conn = sqlite3.connect(":memory:", uri=True)
+        try:
+            for alias, uri in uris.items():
+                conn.execute("ATTACH DATABASE ? AS ?", (uri, alias))
+                conn.execute(f'PRAGMA "{alias}".mmap_size = {int(mmap_size)}').fetchall()
+                print(f"*{backup_names.get(alias, os.path.basename(self.db_path))}* attached as *{alias}*")
+        except Exception as e:
+            conn.close()
+            raise Exception(f"Error while attaching snapshots: {str(e)}")
+        return conn
+
+    def set_backup_rules(self, engine=None, pages=None, sleep=None, progress=None, block_pages=None, compression=None, 
+                         max_restarts=None, max_chain=None, verbose=False):
+        '''Used to modify how backups are taken. Engines:
+        - "copy": commits, closes the connection and copies the file (default)
+        - "online": uses the sqlite3 backup API on a separate read-only connection, copying *pages* pages per step and 
+        sleeping *sleep* seconds between steps, so other readers and writers keep working meanwhile. *progress* is 
+        called after every step as progress(status, remaining, total). A commit from any other connection (this 
+        object's one included) restarts the copy from the first page, so after *max_restarts* restarts the rest is 
+        copied in a single step, which holds a read lock until it ends
+        - "incremental": takes a full .db base and then .delta files holding only the blocks of *block_pages* pages 
+        whose hash changed since the last backup. The chain is kept in the checkpoint .json and the block hashes 
+        in a .hashes file next to the last backup of the chain. After *max_chain* deltas a new base is taken, so 
+        restores don't replay an ever longer chain and prune_backups can delete the old ones
+        A *compression* ("lzma", or "zstd" if zstandard is installed) makes the copy and online engines stream a 
+        consistent image of the database into a .db.xz/.db.zst file instead. Use compression="none" to disable it'''
+        if engine is not None:
+            if engine not in ("copy", "online", "incremental"):
+                raise ValueError(f"Unsupported backup engine: {engine}. Try 'copy', 'online' or 'incremental'.")
+            self.engine = engine
+        if pages is not None:
+            if not isinstance(pages, int) or pages == 0:
+                raise ValueError("pages must be a non-zero integer (negative copies everything in one step)")
+            self.pages = pages
+        if sleep is not None:
+            self.sleep = max(0.0, float(sleep))
+        if progress is not None:
+            self.progress = progress
+        if max_restarts is not None:
+            if not isinstance(max_restarts, int) or max_restarts < 0:
+                raise ValueError("max_restarts must be a non-negative integer")
+            self.max_restarts = max_restarts
+        if block_pages is not None:
+            if not isinstance(block_pages, int) or block_pages <= 0:
+                raise ValueError("block_pages must be a positive integer")
+            self.block_pages = block_pages
+        if max_chain is not None:
+            if not isinstance(max_chain, int) or max_chain < 0:
+                raise ValueError("max_chain must be a non-negative integer")
+            self.max_chain = max_chain
+        if compression is not None:
+            if compression == "none":
+                self.compression = None
+            elif compression not in COMPRESSED_EXTENSIONS:
+                raise ValueError(f"Unsupported compression: {compression}. Try 'lzma', 'zstd' or 'none'.")
+            elif compression == "zstd" and zstandard is None:
+                raise ImportError("zstd compression requires the zstandard package: pip install zstandard")
+            else:
+                self.compression = compression
+        if verbose:
+            print(f"Backup rules:\nengine={self.engine}\npages={self.pages}\nsleep={self.sleep}\nmax_restarts={self.max_restarts}"
+                  f"\nblock_pages={self.block_pages}\nmax_chain={self.max_chain}"
+                  f"\ncompression={self.compression}")
+
     def promote(self, db_name=None, backup_name=None):
         '''Restores the desired backup. Will destroy the specified database to replace.'''
         if db_name is None:
@@ -173,9 +323,10 @@ class SQLite_Backup(SQLite_Handler):
         if backup_name is None:
             raise ValueError("No backup db filename defined")
             
-        # Make sure backup_name has .db extension
-        if not backup_name.lower().endswith('.db'):
+        # Make sure backup_name has a backup extension
+        if not backup_name.lower().endswith(('.db', '.delta', '.xz', '.zst')):
             backup_name += '.db'
+        is_delta = backup_name.lower().endswith('.delta')
             
         backup_path = os.path.join(self.backup_folder, backup_name)
         
@@ -197,8 +348,10 @@ class SQLite_Backup(SQLite_Handler):
             if db_path == self.db_path:
                 self.close_conn()
                 if db_path != ":memory:":  # Can't copy to memory
-                    shutil.copy(backup_path, db_path)
+                    self._restore(backup_path, db_path)
                     print(f"Backup {backup} restored to {db_path}")
+                elif is_delta or backup_name.lower().endswith(('.xz', '.zst')):
+                    print("Cannot restore an incremental or compressed backup to an in-memory database")
                 else:
                     print("Cannot restore a file backup to an in-memory database")
                     print("Will connect to the backup instead")
@@ -207,7 +360,7 @@ class SQLite_Backup(SQLite_Handler):
             else:
                 # If restoring to a different database than current connection
                 if db_path != ":memory:":  # Can't copy to memory
-                    shutil.copy(backup_path, db_path)
+                    self._restore(backup_path, db_path)
                     print(f"Backup {backup} restored to {db_path}")
                 else:
                     print("Cannot restore a file backup to an in-memory database")
@@ -230,6 +383,8 @@ class SQLite_Backup(SQLite_Handler):
             # Check if it's time for a backup
             if time_elapsed >= self.backup_time:
                 self._backup(db_path)
+                with open(self.json_path, "r") as json_file: # Reload, the backup may have updated it
+                    data = json.load(json_file)
                 
                 # Update JSON with new time
                 data["date"] = current_time
@@ -246,7 +401,8 @@ class SQLite_Backup(SQLite_Handler):
             print(f"Auto-backup failed: {e}. Check if a checkpoint for the db is created.")
 
     def _backup(self, db_path):
-        '''Creates the backup'''
+        '''Creates the backup. Returns a dictionary with the backup path, its size, the time spent and the 
+        throughput in MB/s, or None if it failed'''
         _, current_date_format = self._get_date(time.localtime())
         
         if db_path == ":memory:":
@@ -257,13 +413,40 @@ class SQLite_Backup(SQLite_Handler):
             
         backup_name = f"{db_name}_backup_{current_date_format}.db"
         backup_path = os.path.join(self.backup_folder, backup_name)
+        start = time.perf_counter()
         
         # Handle memory database case
-        if db_path == ":memory:":
+        if db_path == ":memory:" and self.compression is not None:
+            backup_path += COMPRESSED_EXTENSIONS[self.compression]
+            with self._open_compressed(backup_path, "wb") as target:
+                target.write(self.conn.serialize())
+            print(f"*{os.path.basename(backup_path)}* has been created from memory database.")
+        elif db_path == ":memory:":
             backup_db = sqlite3.connect(backup_path)
             self.conn.backup(backup_db)
             backup_db.close()
             print(f"*{backup_name}* has been created from memory database.")
+        elif self.compression is not None and self.engine != "incremental":
+            try:
+                backup_path = self._compressed_backup(db_path, backup_path)
+                print(f"*{os.path.basename(backup_path)}* has been created.")
+            except Exception as e:
+                print(f"Error creating backup: {e}")
+                return None
+        elif self.engine == "online":
+            try:
+                self._online_backup(db_path, backup_path)
+                print(f"*{backup_name}* has been created.")
+            except Exception as e:
+                print(f"Error creating backup: {e}")
+                return None
+        elif self.engine == "incremental":
+            try:
+                backup_path = self._incremental_backup(db_path, os.path.splitext(backup_path)[0])
+                print(f"*{os.path.basename(backup_path)}* has been created.")
+            except Exception as e:
+                print(f"Error creating backup: {e}")
+                return None
         else:
             # Handle file database case
             is_current_db = (db_path == self.db_path)
@@ -287,6 +470,267 @@ class SQLite_Backup(SQLite_Handler):
                 # Ensure connection is restored
                 if is_current_db:
                     self.reconnect(verbose=False)
+                return None
+        engine = self.engine if self.compression is None or self.engine == "incremental" else f"{self.engine}+{self.compression}"
+        return self._backup_result(backup_path, engine, time.perf_counter() - start)
+
+    def _online_backup(self, db_path, backup_path):
+        '''Copies the database with the sqlite3 backup API in steps of self.pages pages. The source is opened on its own 
+        read-only connection, so this object's connection is neither committed nor closed and can run in any thread. 
+        The copy is written next to the target and renamed when complete. A database written faster than it is copied 
+        restarts the copy over and over, so after self.max_restarts restarts it is copied again in one step'''
+        partial_path = backup_path + ".part"
+        source = sqlite3.connect(f"{Path(os.path.abspath(db_path)).as_uri()}?mode=ro", uri=True)
+        try:
+            target = sqlite3.connect(partial_path)
+            try:
+                try:
+                    source.backup(target, pages=self.pages, progress=self._restart_guard(), sleep=self.sleep)
+                except _BackupRestarted:
+                    print(f"    The copy restarted more than {self.max_restarts} time(s), copying in one step")
+                    source.backup(target, pages=-1, progress=self.progress)
+            finally:
+                target.close()
+                source.close()
+            os.replace(partial_path, backup_path)
+        finally:
+            if os.path.exists(partial_path): # Failed copy
+                os.remove(partial_path)
+
+    def _restart_guard(self):
+        '''Progress callback of the stepped copy that forwards to self.progress and raises _BackupRestarted once 
+        the copy went back to the first page more than self.max_restarts times'''
+        last_remaining, restarts = None, 0
+        def progress(status, remaining, total):
+            nonlocal last_remaining, restarts
+            if last_remaining is not None and remaining > last_remaining: # Started over after a commit
+                restarts += 1
+                if restarts > self.max_restarts:
+                    raise _BackupRestarted()
+            last_remaining = remaining
+            if self.progress is not None:
+                self.progress(status, remaining, total)
+        return progress
+
+    def _compressed_backup(self, db_path, backup_path):
+        '''Streams a consistent image of the database through the compressor. Rollback journal databases are read 
+        straight from their file, so the only disk used is the archive. WAL databases (and on Windows the ones over 
+        1 GB) are first copied to a temporary file, see _snapshot. Returns the path of the written file'''
+        backup_path += COMPRESSED_EXTENSIONS[self.compression]
+        try:
+            with self._snapshot(db_path) as (source, _):
+                with self._open_compressed(backup_path + ".part", "wb") as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+            os.replace(backup_path + ".part", backup_path)
+        finally:
+            if os.path.exists(backup_path + ".part"): # Failed copy
+                os.remove(backup_path + ".part")
+        return backup_path
+
+    def _open_compressed(self, path, mode):
+        '''Opens a compressed backup as a binary stream based on its extension'''
+        if path.lower().endswith((".xz", ".xz.part")):
+            return lzma.open(path, mode, preset=1) if "w" in mode else lzma.open(path, mode)
+        if zstandard is None:
+            raise ImportError("zstd backups require the zstandard package: pip install zstandard")
+        if "w" in mode:
+            return zstandard.ZstdCompressor(level=3).stream_writer(open(path, mode))
+        return zstandard.ZstdDecompressor().stream_reader(open(path, mode))
+
+    def _incremental_backup(self, db_path, backup_stem):
+        '''Writes a full .db base if there is no usable one in the checkpoint, or a .delta file with the blocks that 
+        changed since the last backup otherwise. A chain of self.max_chain deltas gets a new base. The block hashes go 
+        to a .hashes sidecar of the written file, the checkpoint only names it. Returns the path of the written file'''
+        try:
+            with open(self.json_path, "r") as json_file:
+                data = json.load(json_file)
+        except FileNotFoundError:
+            data = {}
+        state = data.get("incremental")
+        previous_hashes = state.get("hashes_file") if state is not None else None
+        if os.path.exists(backup_stem + ".db") or os.path.exists(backup_stem + ".delta"): # Never overwrite a chain link
+            backup_stem += f"_{time.time_ns()}"
+        with self._snapshot(db_path) as (source, page_size):
+            block_size = page_size * self.block_pages
+            usable = (state is not None and state["page_size"] == page_size and state["block_pages"] == self.block_pages
+                      and len(state["chain"]) < self.max_chain 
+                      and os.path.exists(os.path.join(self.backup_folder, state["base"])))
+            old_hashes = self._read_block_hashes(state) if usable else None
+            usable = old_hashes is not None
+            hashes = []
+            backup_path = backup_stem + (".delta" if usable else ".db")
+            try:
+                if not usable: # Full base
+                    with open(backup_path + ".part", "wb") as target:
+                        while block := source.read(block_size):
+                            hashes.append(hashlib.blake2b(block, digest_size=16).digest())
+                            target.write(block)
+                    state = {"base": os.path.basename(backup_path), "page_size": page_size, 
+                             "block_pages": self.block_pages, "chain": []}
+                else: # Delta against the last backup of the chain
+                    parent = state["chain"][-1] if state["chain"] else state["base"]
+                    changed = 0
+                    with open(backup_path + ".part", "wb") as target:
+                        target.write(b"\0" * 4) # Header length, filled in at the end
+                        index = 0
+                        while block := source.read(block_size):
+                            digest = hashlib.blake2b(block, digest_size=16).digest()
+                            hashes.append(digest)
+                            if index >= len(old_hashes) or old_hashes[index] != digest:
+                                target.write(struct.pack(">QI", index, len(block)))
+                                target.write(block)
+                                changed += 1
+                            index += 1
+                        header = json.dumps({"base": state["base"], "parent": parent, "page_size": page_size, 
+                                             "block_pages": self.block_pages, "file_size": source.tell(), 
+                                             "blocks": changed}).encode()
+                        target.write(header) # The header goes last so the blocks can be streamed
+                        target.seek(0)
+                        target.write(struct.pack(">I", len(header)))
+                    print(f"    {changed}/{len(hashes)} block(s) changed since *{parent}*")
+                hashes_path = backup_path + ".hashes"
+                with open(hashes_path + ".part", "wb") as target:
+                    target.write(b"".join(hashes))
+                os.replace(backup_path + ".part", backup_path)
+                os.replace(hashes_path + ".part", hashes_path)
+            except BaseException:
+                for path in (backup_path + ".part", backup_path + ".hashes.part"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                raise
+        state.pop("hashes", None) # Checkpoints from before the sidecar kept the whole list
+        state["hashes_file"] = os.path.basename(hashes_path)
+        if usable:
+            state["chain"].append(os.path.basename(backup_path))
+        data["incremental"] = state
+        with open(self.json_path, "w") as json_file:
+            json.dump(data, json_file)
+        if previous_hashes is not None and os.path.exists(os.path.join(self.backup_folder, previous_hashes)):
+            os.remove(os.path.join(self.backup_folder, previous_hashes)) # Only the last one of the chain is needed
+        return backup_path
+
+    def _read_block_hashes(self, state):
+        '''Block hashes of the last backup of the chain, or None if they are missing'''
+        if "hashes" in state: # Checkpoints from before the sidecar
+            return [bytes.fromhex(digest) for digest in state["hashes"]]
+        hashes_path = os.path.join(self.backup_folder, state.get("hashes_file", ""))
+        if not state.get("hashes_file") or not os.path.exists(hashes_path):
+            return None
+        with open(hashes_path, "rb") as hashes_file:
+            content = hashes_file.read()
+        return [content[i:i + 16] for i in range(0, len(content), 16)]
+
+    @contextmanager
+    def _snapshot(self, db_path):
+        '''Yields a file object with a consistent image of the database and its page size. In rollback journal mode 
+        the file itself is read while a read transaction blocks commits. WAL databases, whose file alone isn't a 
+        consistent image, and on Windows the ones holding the lock page, which the mandatory locks keep from being 
+        read, are first copied with the backup API into a temporary file of this backup only'''
+        reader = sqlite3.connect(f"{Path(os.path.abspath(db_path)).as_uri()}?mode=ro", uri=True, isolation_level=None)
+        try:
+            page_size = reader.execute("PRAGMA page_size").fetchone()[0]
+            wal = reader.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            if not wal and not (os.name == "nt" and os.path.getsize(db_path) > LOCK_PAGE_OFFSET):
+                reader.execute("BEGIN")
+                reader.execute("SELECT COUNT(*) FROM sqlite_master").fetchone() # Takes the shared lock
+                try:
+                    with open(db_path, "rb") as source:
+                        yield source, page_size
+                finally:
+                    reader.execute("ROLLBACK")
+                return
+            descriptor, snapshot_path = tempfile.mkstemp(prefix=f".{os.path.basename(db_path)}_", suffix=".snapshot.tmp", 
+                                                         dir=self.backup_folder) # Unique, backups may run concurrently
+            os.close(descriptor)
+            try:
+                target = sqlite3.connect(snapshot_path)
+                try:
+                    reader.backup(target, pages=self.pages, sleep=self.sleep)
+                    target.execute("PRAGMA journal_mode = DELETE")
+                finally:
+                    target.close()
+                with open(snapshot_path, "rb") as source:
+                    yield source, page_size
+            finally:
+                os.remove(snapshot_path)
+        finally:
+            reader.close()
+
+    def _restore(self, backup_path, db_path):
+        '''Writes the backup to db_path. A .delta backup is rebuilt from its base plus every delta of its chain and a 
+        compressed one is decompressed on the fly'''
+        if backup_path.lower().endswith((".xz", ".zst")): # Decompressed straight into the target
+            with self._open_compressed(backup_path, "rb") as source, open(db_path, "wb") as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            return
+        if not backup_path.lower().endswith(".delta"):
+            shutil.copy(backup_path, db_path)
+            return
+        chain = []
+        path = backup_path
+        while path.lower().endswith(".delta"): # Walks back to the base
+            header = self._read_delta_header(path)
+            chain.insert(0, (path, header))
+            path = os.path.join(self.backup_folder, header["parent"])
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Backup file {header['parent']} of the chain not found in {self.backup_folder}")
+        shutil.copyfile(path, db_path)
+        with open(db_path, "r+b") as target:
+            for path, header in chain:
+                block_size = header["page_size"] * header["block_pages"]
+                with open(path, "rb") as delta:
+                    delta.seek(4)
+                    for _ in range(header["blocks"]):
+                        index, length = struct.unpack(">QI", delta.read(12))
+                        target.seek(index * block_size)
+                        target.write(delta.read(length))
+                target.truncate(header["file_size"])
+
+    def _read_delta_header(self, delta_path):
+        '''Reads the json header stored at the end of a .delta file'''
+        with open(delta_path, "rb") as delta:
+            header_length = struct.unpack(">I", delta.read(4))[0]
+            delta.seek(-header_length, os.SEEK_END)
+            return json.loads(delta.read(header_length))
+
+    def _backup_names(self):
+        '''(full backups, deltas) of the database in the backup folder, the full ones newest first'''
+        name_without_extension = os.path.splitext(os.path.basename(self.json_path))[0]
+        prefix = f"{name_without_extension}_backup_"
+        full, deltas = [], []
+        for name in os.listdir(self.backup_folder):
+            if not name.startswith(prefix):
+                continue
+            if name.lower().endswith((".db", ".db.xz", ".db.zst")):
+                full.append(name)
+            elif name.lower().endswith(".delta"):
+                deltas.append(name)
+        full.sort(key=self._backup_date, reverse=True)
+        return full, deltas
+
+    def _snapshot_uri(self, backup_name):
+        '''Read-only, immutable URI of a .db backup of the backup folder'''
+        if not backup_name.lower().endswith(('.db', '.delta', '.xz', '.zst')):
+            backup_name += '.db'
+        if backup_name.lower().endswith(('.delta', '.xz', '.zst')):
+            raise ValueError(f"*{backup_name}* is an incremental or compressed backup and can't be opened in place. "
+                             "Restore it into another database with promote(db_name=...) first.")
+        backup_path = os.path.join(self.backup_folder, backup_name)
+        if not os.path.exists(backup_path):
+            raise FileNotFoundError(f"Backup file {backup_name} not found in {self.backup_folder}")
+        return f"{Path(backup_path).as_uri()}?mode=ro&immutable=1"
+
+    def _backup_result(self, backup_path, engine, seconds):
+        '''Summarizes a finished backup'''
+        size = os.path.getsize(backup_path)
+        mb_s = size / (1024 * 1024) / seconds if seconds > 0 else float("inf")
+        print(f"    {size / (1024 * 1024):.2f} MB in {seconds:.3f}s ({mb_s:.2f} MB/s)")
+        return {"backup_path": backup_path, "engine": engine, "bytes": size, "seconds": seconds, "mb_s": mb_s}
+
+    def _backup_date(self, backup_name):
+        '''Sort key with the date encoded in a backup name (copy2 keeps the mtime of the database, not of the backup)'''
+        match = re.search(r"(\d+)y-(\d+)m-(\d+)d_(\d+)h-(\d+)m-(\d+)s", backup_name)
+        return tuple(int(value) for value in match.groups()) + (backup_name,) if match else (0,) * 6 + (backup_name,)
 
     def _get_date(self, time_struct):
         '''Gets the current date in both numeric and readable time'''
@@ -321,4 +765,7 @@ class SQLite_Backup(SQLite_Handler):
             except Exception as e:
                 raise Exception(f"Error while formatting the string: {e}")
         else:
-            raise ValueError("Invalid input type. Use either int or 'HH:MM:SS' string for time input.")
\ No newline at end of file
+            raise ValueError("Invalid input type. Use either int or 'HH:MM:SS' string for time input.")
+
+class _BackupRestarted(Exception):
+    '''Raised by the progress callback to stop a stepped copy that keeps restarting'''
@@ -1,7 +1,13 @@
-import os, sys, re
-import pandas as pd
+import os, sys, re, time, sqlite3, json
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse
-from sqlite_handler import SQLite_Handler
+from .sqlite_handler import SQLite_Handler
+from .ingest_manifest import IngestManifest
+from .json_handler import _fold
+# pandas, numpy, openpyxl and the bulk writer are imported where they are used, so handlers that never build a 
+# DataFrame don't pay for them
 #Secondary requirements: pip install openpyxl
 
 class SQLite_Data_Extractor(SQLite_Handler):
@@ -28,21 +34,37 @@ class SQLite_Data_Extractor(SQLite_Handler):
         self.source_name = None
         self.add_index = False
         self.sep = ","
+        self.chunksize = 100000
+        self.writer = "pandas"
+        self.reader = "pandas"
+        self.relax = False
+        self.sheet_workers = 1
+        self.ingest_stats = []
+        self._manifest = None
 
-    def store(self, source):
-        '''Generates table(s) of the given name using data from different sources'''
+    def store(self, source, stream=False, skip_unchanged=False):
+        '''Generates table(s) of the given name using data from different sources. With stream=True the supported 
+        filetypes (.csv, .xlsx, .json and JSON lines as .jsonl or .ndjson) are read and written in bounded chunks (see 
+        set_rules(chunksize=...)). With skip_unchanged=True files already ingested with the same content (see 
+        the manifest property) are skipped'''
         self.source_name = source
         self._inputhandler() # Handles the source input format
         # Proccess data based of extension:
-        self._input_type_workflow()
+        self._input_type_workflow(stream, skip_unchanged)
         try: # Incase there is a problem with the parent method
             self.consult_tables()
         except Exception as e:
             pass
 
-    def store_directory(self, input_rel_path=None):
+    def store_directory(self, input_rel_path=None, stream=False, parallel=False, workers=None, ordered=True, 
+                        skip_unchanged=False):
         '''Generates table(s) for all the compatible files inside the custom directory. If the directory isn't given, it uses 
-        ../data/'''
+        ../data/. With stream=True the supported filetypes are read and written in bounded chunks. With parallel=True 
+        the files are parsed in a pool of worker processes (os.cpu_count() if workers is None) while this object 
+        writes the results as they arrive, in directory order if ordered=True or in completion order otherwise. With 
+        skip_unchanged=True only new or modified files are ingested'''
+        if stream and parallel:
+            raise ValueError("stream and parallel modes can't be combined")
         if input_rel_path:
             try: #Check if the directory exists, and create it if it doesn't
                 directory_path = os.path.abspath(input_rel_path)
@@ -64,7 +86,10 @@ class SQLite_Data_Extractor(SQLite_Handler):
                 print("    The operation has been canceled.")
                 sys.exit(1)
         # Proccess data based of extension:
-        self._input_type_workflow()
+        if parallel:
+            self._parallel_workflow(workers, ordered, skip_unchanged)
+        else:
+            self._input_type_workflow(stream, skip_unchanged)
         try:  
             self.consult_tables()
         except Exception as e: #In case there is a problem with the parent method
@@ -76,7 +101,7 @@ class SQLite_Data_Extractor(SQLite_Handler):
             try:
                 table_name = re.sub(r'\W', '_', table_name) #Replace non-alphanumeric characters with underscores in table_name
                 self.df = df
-                self.df.to_sql(table_name, self.conn, if_exists='replace', index=self.add_index)
+                self._write_df(self.df, table_name, if_exists='replace', index=self.add_index)
                 self.conn.commit()
                 print(f"Dataframe stored as *{table_name}*")
             except Exception as e:
@@ -85,7 +110,7 @@ class SQLite_Data_Extractor(SQLite_Handler):
             try:
                 table_name = f"Exported_df"
                 self.df = df
-                self.df.to_sql(table_name, self.conn, if_exists='fail', index=self.add_index)
+                self._write_df(self.df, table_name, if_exists='fail', index=self.add_index)
                 self.conn.commit()
                 print(f"Dataframe stored as *{table_name}*")
             except Exception as e:
@@ -94,12 +119,13 @@ class SQLite_Data_Extractor(SQLite_Handler):
     def retrieve(self, table_name):
         '''Retrieves a table from the database as a dataframe object. If the arg. is a list or tuple it will try to concatenate
         all the tables'''
+        import pandas as pd
         self.index_col = None if not hasattr(self, 'index_col') else self.index_col
         if isinstance(table_name, str):
             try:
                 self.cursor = self.conn.cursor()
                 query = f"SELECT * FROM {table_name}"
-                self.df = pd.read_sql(query, self.conn, index_col=self.index_col)
+                self.df = self._cached(query, (), lambda: self._read_df(query), (self.index_col, self.reader))
                 print(f"Table *{table_name}* retrieved succesfully.")
                 return self.df
             except Exception as e:
@@ -111,7 +137,7 @@ class SQLite_Data_Extractor(SQLite_Handler):
                 try:
                     self.cursor = self.conn.cursor()
                     query = f"SELECT * FROM {table}"
-                    df = pd.read_sql(query, self.conn, index_col=self.index_col)
+                    df = self._cached(query, (), lambda: self._read_df(query), (self.index_col, self.reader))
                     dataframes.append(df)
                     print(f"Table {table} retrieved succesfully.")
                 except Exception as e:
@@ -123,11 +149,128 @@ class SQLite_Data_Extractor(SQLite_Handler):
                 print(f"Error concatenating dataframes: {str(e)}")
         return self.df
 
-    def set_rules(self, sep=None, add_index=False, index_col=None, verbose=False):
-        '''Used to modify the rules that pandas uses to parse files.'''
+    def retrieve_chunks(self, table_name, columns=None, where=None, params=(), chunksize=None, raw=False):
+        '''Yields a table (or several, one after the other, if given in list or tuple format) in chunks of *chunksize*
+        rows, the chunksize rule by default. Only the *columns* given are selected and *where* is sent to SQLite as a
+        WHERE clause with ? placeholders filled from *params*. Yields dataframes, or lists of row tuples if raw=True.
+        Nothing is kept in self.df, so memory is bounded by the chunk size'''
+        import pandas as pd
+        tables = [table_name] if isinstance(table_name, str) else table_name
+        chunksize = self.chunksize if chunksize is None else chunksize
+        index_col = getattr(self, 'index_col', None)
+        projection = "*" if not columns else ", ".join(f'"{column}"' for column in columns)
+        for table in tables:
+            query = f'SELECT {projection} FROM "{table}"'
+            if where:
+                query += f" WHERE {where}"
+            cursor = self.conn.cursor() # Own cursor, so other queries can run between chunks
+            try:
+                cursor.execute(query, params)
+            except Exception as e:
+                raise Exception(f"Error retrieving table in chunks: {str(e)}")
+            names = [description[0] for description in cursor.description]
+            try:
+                while rows := cursor.fetchmany(chunksize):
+                    if raw:
+                        yield rows
+                        continue
+                    df = pd.DataFrame.from_records(rows, columns=names)
+                    yield df.set_index(index_col) if index_col is not None else df
+            finally:
+                cursor.close()
+
+    def retrieve_columns(self, table_name, columns=None, where=None, params=(), output="numpy"):
+        '''Retrieves a table column by column, filling typed arrays straight from small cursor batches instead of 
+        holding every row of the table as a tuple first. *output* "numpy" returns a dict of column name: NumPy array 
+        (int64, float64 or object), "arrow" a pyarrow Table of record batches of chunksize rows (requires pyarrow) and 
+        "pandas" a dataframe built on the arrays. *columns* and *where* work as in retrieve_chunks'''
+        if output not in ("numpy", "arrow", "pandas"):
+            raise ValueError(f"Unsupported output: {output}. Try 'numpy', 'arrow' or 'pandas'.")
+        from .columnar import fetch_columns, pyarrow, require_pyarrow
+        if output == "arrow":
+            require_pyarrow()
+        cursor = self._select(table_name, columns, where, params)
+        try:
+            if output == "arrow":
+                return pyarrow.Table.from_batches(list(self._record_batches(cursor, table_name, self.chunksize)))
+            arrays = fetch_columns(cursor)
+        except Exception as e:
+            raise Exception(f"Error retrieving table columns: {str(e)}")
+        finally:
+            cursor.close()
+        if output == "numpy":
+            return arrays
+        import pandas as pd
+        df = pd.DataFrame(arrays, copy=False)
+        index_col = getattr(self, 'index_col', None)
+        return df.set_index(index_col) if index_col is not None else df
+
+    def retrieve_batches(self, table_name, columns=None, where=None, params=(), chunksize=None):
+        '''Yields a table as Arrow record batches of *chunksize* rows sharing one schema (requires pyarrow). Column 
+        types come from the declared types of the table'''
+        chunksize = self.chunksize if chunksize is None else chunksize
+        cursor = self._select(table_name, columns, where, params)
+        try:
+            yield from self._record_batches(cursor, table_name, chunksize)
+        finally:
+            cursor.close()
+
+    def export_parquet(self, table_name, folder=None, columns=None, where=None, params=(), chunksize=None, 
+                       compression="snappy"):
+        '''Streams a table (or several, if given in list or tuple format) into a Parquet file per table, 
+        *table_name*.parquet in *folder* (by default a parquet folder next to the database), one row group per 
+        chunk, so memory is bounded by the chunk size (requires pyarrow). Returns a dict of table: result dictionary 
+        with the file path, rows, bytes and seconds'''
+        from .columnar import write_parquet, require_pyarrow
+        require_pyarrow()
+        tables = [table_name] if isinstance(table_name, str) else table_name
+        folder = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), "parquet") if folder is None else folder
+        os.makedirs(folder, exist_ok=True)
+        results = {}
+        for table in tables:
+            path = os.path.join(folder, f"{table}.parquet")
+            start = time.perf_counter()
+            try:
+                rows = write_parquet(self.retrieve_batches(table, columns, where, params, chunksize), path, compression)
+            except Exception as e:
+                raise Exception(f"Error exporting *{table}* to Parquet: {str(e)}")
+            results[table] = {"path": path, "rows": rows, "bytes": os.path.getsize(path), 
+                              "seconds": time.perf_counter() - start}
+            print(f"Table *{table}* exported to {path} ({rows} rows)")
+        return results
+
+    def set_rules(self, sep=None, add_index=False, index_col=None, chunksize=None, writer=None, relax=None, 
+                  sheet_workers=None, reader=None, verbose=False):
+        '''Used to modify the rules that pandas uses to parse files. The writer used for dataframes can be "pandas" 
+        (DataFrame.to_sql) or "bulk" (typed executemany in a single transaction, with relaxed journal and syncs during 
+        the load if relax=True). sheet_workers is the number of processes that stream the sheets of a workbook in 
+        stream mode (1 streams them one after the other in this process). The reader used by retrieve can be "pandas" 
+        (read_sql) or "columnar" (typed arrays filled from cursor batches, see retrieve_columns)'''
         self.index_col = index_col
         self.add_index = add_index
         self.sep = "," if sep is None else sep
+        if chunksize is not None:
+            if not isinstance(chunksize, int) or chunksize <= 0:
+                raise ValueError("chunksize must be a positive integer")
+            self.chunksize = chunksize
+            print(f"Chunk size set to:{self.chunksize}") if verbose == True else None
+        if writer is not None:
+            if writer not in ("pandas", "bulk"):
+                raise ValueError(f"Unsupported writer: {writer}. Try 'pandas' or 'bulk'.")
+            self.writer = writer
+            print(f"Writer set to:{self.writer}") if verbose == True else None
+        if reader is not None:
+            if reader not in ("pandas", "columnar"):
+                raise ValueError(f"Unsupported reader: {reader}. Try 'pandas' or 'columnar'.")
+            self.reader = reader
+            print(f"Reader set to:{self.reader}") if verbose == True else None
+        if relax is not None:
+            self.relax = relax
+        if sheet_workers is not None:
+            if not isinstance(sheet_workers, int) or sheet_workers <= 0:
+                raise ValueError("sheet_workers must be a positive integer")
+            self.sheet_workers = sheet_workers
+            print(f"Sheet workers set to:{self.sheet_workers}") if verbose == True else None
         if isinstance(self.sep, (str,)) and self.sep in (",", ".", " "):
             print(f"Updated rules:\nSeparator set to:{self.sep}") if verbose == True else None
         else:
@@ -139,14 +282,27 @@ class SQLite_Data_Extractor(SQLite_Handler):
         self.index_col = None
         self.add_index = False
         self.sep = ","
+        self.chunksize = 100000
+        self.writer = "pandas"
+        self.reader = "pandas"
+        self.relax = False
+        self.sheet_workers = 1
         if verbose == True:
-            print(f"Object rules set to default:\nindex_col={self.index_col}\nadd_index={self.add_index}\nsep={self.sep }")
+            print(f"Object rules set to default:\nindex_col={self.index_col}\nadd_index={self.add_index}\nsep={self.sep }\nchunksize={self.chunksize}"
+                  f"\nwriter={self.writer}\nreader={self.reader}\nrelax={self.relax}\nsheet_workers={self.sheet_workers}")
+
+    @property
+    def manifest(self):
+        '''Ingest manifest of the database: path, size, mtime and hash of every file stored with skip_unchanged=True'''
+        if self._manifest is None or self._manifest.conn is not self.conn:
+            self._manifest = IngestManifest(self.conn)
+        return self._manifest
 
     def delete_table(self, table_name):
         super().delete_table(table_name) 
 
-    def examine_table(self, table_name):
-        super().examine_table(table_name) 
+    def examine_table(self, table_name, limit: int = None, mode: str = "head"):
+        super().examine_table(table_name, limit, mode)
 
     '''Internal methods'''
     def _inputhandler(self):
@@ -167,64 +323,130 @@ class SQLite_Data_Extractor(SQLite_Handler):
             else:
                 raise Exception(f"Error importing data: Data mas be specified in str, list or tuple format") 
 
-    def _input_type_workflow(self):        
+    def _input_type_workflow(self, stream=False, skip_unchanged=False):        
         for index, source_path in enumerate(self.source_path):
             source_path = os.path.abspath(source_path)
-            self._filetypehandler(source_path)  #Handles the filetype
-            if self.extension == "xlsx":
-                self._datasheet_excel(index)
-            if self.extension == "csv":
-                self._datasheet_csv(index)
-            if self.extension == "json":
-                self._datasheet_json(index)
-
-    def _filetypehandler(self, source_path):
-        '''Handles all the supported filetypes. Currently supported:
-        - .csv
-        - .xlsx (Excel)
-        - .json
-        - An URL pointing to a file of the above'''
-        
-        self.extension = source_path.split(".")[-1].lower()  # Get file extension, case-insensitive
-
-        match self.extension:
-            case "xlsx":
-                try:
-                    self.df = pd.read_excel(source_path, sheet_name=None)  # Dictionary of DataFrames
-                except Exception as e:
-                    raise Exception(f"Error importing Excel file into pandas: {str(e)}")
+            fingerprint = None
+            if skip_unchanged:
+                skip, fingerprint = self._manifest_check(source_path)
+                if skip:
+                    continue
+            if stream and source_path.split(".")[-1].lower() == "csv":
+                self._datasheet_csv_stream(source_path, index)  #Reads and writes in bounded chunks
+            elif stream and source_path.split(".")[-1].lower() == "xlsx":
+                self._datasheet_excel_stream(source_path, index)
+            elif stream and source_path.split(".")[-1].lower() in ("json", "jsonl", "ndjson"):
+                self._datasheet_json_stream(source_path, index)
+            else:
+                self.source_name = source_path  # Used to name the table(s)
+                self._filetypehandler(source_path)  #Handles the filetype
+                self._datasheet_dispatch(index)
+            if fingerprint is not None:
+                self.conn.commit()
+                self.manifest.record(source_path, fingerprint)
 
-            case "csv":
-                try:
-                    self.df = pd.read_csv(source_path, header=0, sep=self.sep)
-                except Exception as e:
-                    raise Exception(f"Error importing CSV into pandas: {str(e)}")
+    def _parallel_workflow(self, workers=None, ordered=True, skip_unchanged=False):
+        '''Parses every source in a process pool. The parsed data is sent back to this process, which is the only 
+        writer of the connection and commits each file as soon as it is written. At most 2 x workers files are parsed 
+        or waiting to be written at a time, so memory doesn't grow with the number of files when the writer is slower'''
+        sources = [(index, os.path.abspath(source_path)) for index, source_path in enumerate(self.source_path)]
+        fingerprints = {}
+        if skip_unchanged:
+            for index, source_path in list(sources):
+                skip, fingerprints[source_path] = self._manifest_check(source_path)
+                if skip:
+                    sources.remove((index, source_path))
+        self.ingest_stats = []
+        start = time.perf_counter()
+        window = 2 * (workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = _bounded_map(executor, _parse_source, ((index, source_path, self.sep) for index, source_path in sources), 
+                                   window, ordered)
+            try:
+                for index, source_path, extension, df, parse_time in results:
+                    if df is None: # Unsupported filetype
+                        continue
+                    write_start = time.perf_counter()
+                    self.source_name = source_path # Used to name the table(s)
+                    self.extension = extension
+                    self.df = df
+                    self._datasheet_dispatch(index)
+                    self.conn.commit()
+                    if fingerprints.get(source_path) is not None:
+                        self.manifest.record(source_path, fingerprints[source_path])
+                    write_time = time.perf_counter() - write_start
+                    self.ingest_stats.append({"file": source_path, "parse_s": parse_time, "write_s": write_time})
+                    print(f"    {os.path.basename(source_path)}: parsed in {parse_time:.3f}s, written in {write_time:.3f}s")
+            finally:
+                results.close() # On failure the queued parses are cancelled, only the running ones are waited for
+        elapsed = time.perf_counter() - start
+        print(f"{len(sources)} file(s) ingested in {elapsed:.3f}s")
 
-            case "json":
-                try:
-                    import json
-                    with open(source_path, "r", encoding="utf-8") as f:
-                        raw = json.load(f)
+    def _manifest_check(self, source_path):
+        '''Returns (skip, fingerprint) for a source. URLs and missing files are never skipped nor recorded'''
+        if not os.path.isfile(source_path):
+            return False, None
+        changed, fingerprint = self.manifest.check(source_path)
+        if not changed:
+            print(f"Skipping unchanged *{os.path.basename(source_path)}*")
+        return not changed, fingerprint
 
-                    df = pd.json_normalize(raw)
+    def _write_df(self, df, table_name, if_exists='replace', index=False):
+        '''Writes a dataframe as a table with the selected writer'''
+        if self.writer == "bulk":
+            from .bulk_writer import write_dataframe
+            write_dataframe(self.conn, df, table_name, if_exists=if_exists, index=index, relax=self.relax)
+        else:
+            df.to_sql(table_name, self.conn, if_exists=if_exists, index=index)
 
-                    def clean_value(val):
-                        if isinstance(val, list):
-                            return ", ".join(str(v) for v in val)
-                        elif isinstance(val, dict):
-                            return json.dumps(val, ensure_ascii=False)
-                        else:
-                            return val
+    def _read_df(self, query):
+        '''Reads a query as a dataframe with the selected reader'''
+        import pandas as pd
+        index_col = getattr(self, 'index_col', None)
+        if getattr(self, 'reader', "pandas") != "columnar":
+            return pd.read_sql(query, self.conn, index_col=index_col)
+        from .columnar import fetch_columns
+        cursor = self.conn.execute(query)
+        try:
+            df = pd.DataFrame(fetch_columns(cursor), copy=False)
+        finally:
+            cursor.close()
+        return df.set_index(index_col) if index_col is not None else df
 
-                    df = df.applymap(clean_value)
+    def _select(self, table_name, columns=None, where=None, params=()):
+        '''Executed cursor over the *columns* of a table, filtered by *where*'''
+        projection = "*" if not columns else ", ".join(f'"{column}"' for column in columns)
+        query = f'SELECT {projection} FROM "{table_name}"'
+        if where:
+            query += f" WHERE {where}"
+        try:
+            return self.conn.execute(query, params)
+        except Exception as e:
+            raise Exception(f"Error retrieving table: {str(e)}")
 
-                    if df.empty or len(df.columns) == 0:
-                        raise Exception("El DataFrame resultante está vacío o no tiene columnas.")
+    def _record_batches(self, cursor, table_name, chunksize):
+        from .columnar import record_batches
+        declared_types = {row[1]: row[2] for row in self.catalog.table_info(table_name)}
+        return record_batches(cursor, declared_types, chunksize)
 
-                    self.df = df
+    def _datasheet_dispatch(self, index):
+        '''Sends the parsed data to the db based on its extension'''
+        if self.extension == "xlsx":
+            self._datasheet_excel(index)
+        if self.extension == "csv":
+            self._datasheet_csv(index)
+        if self.extension == "json":
+            self._datasheet_json(index)
 
-                except Exception as e:
-                    raise Exception(f"Error importando JSON como DataFrame: {str(e)}")
+    def _filetypehandler(self, source_path):
+        '''Handles all the supported filetypes. Currently supported:
+        - .csv
+        - .xlsx (Excel)
+        - .json
+        - An URL pointing to a file of the above'''
+        self.extension, df = _read_source(source_path, self.sep)
+        if df is not None:
+            self.df = df
 
     def _datasheet_excel(self, i):
         '''Specific method for sending .xlsx files with all their sheets as tables in the db'''
@@ -244,7 +466,7 @@ class SQLite_Data_Extractor(SQLite_Handler):
                     table_name = f"xlsx_table{j}"
                     print(f"Invalid table name for sheet: *{sheet_name}*. Adding it as *{table_name}*")
                 print(f"    {table_name}")
-                sheet.to_sql(table_name, self.conn, if_exists='replace', index=self.add_index)
+                self._write_df(sheet, table_name, if_exists='replace', index=self.add_index)
         except Exception as e:
             raise Exception(f"Error connecting to database: {str(e)}")
 
@@ -257,10 +479,90 @@ class SQLite_Data_Extractor(SQLite_Handler):
             table_name = self._sanitize_name(source_name, i)
             print(f'Data from *{source_name}* has been imported to {self.db_path}.')
             print(f"    {table_name}")
-            self.df.to_sql(table_name, self.conn, if_exists='replace', index=False)
+            self._write_df(self.df, table_name, if_exists='replace', index=False)
         except Exception as e:
             raise Exception(f"Error connecting to database: {str(e)}")
 
+    def _datasheet_csv_stream(self, source_path, i):
+        '''Streams a .csv file into the db in chunks of self.chunksize rows. Every chunk is inserted with the bulk writer 
+        in its own transaction, so memory stays bounded by the chunk size and not by the file size'''
+        import pandas as pd
+        from .bulk_writer import write_dataframe
+        _, source_name = os.path.split(source_path)
+        source_name, _ = os.path.splitext(source_name)
+        table_name = self._sanitize_name(source_name, i)
+        print(f'Streaming data from *{source_name}* to {self.db_path}.')
+        print(f"    {table_name}")
+        self.ingest_stats = []
+        try:
+            reader = pd.read_csv(source_path, header=0, sep=self.sep, chunksize=self.chunksize)
+        except Exception as e:
+            raise Exception(f"Error importing CSV into pandas: {str(e)}")
+        try:
+            total_rows = 0
+            start = chunk_start = time.perf_counter()
+            for n, chunk in enumerate(reader): # Chunk timings include parsing
+                # The first chunk defines the table schema
+                rows = write_dataframe(self.conn, chunk, table_name, if_exists="replace" if n == 0 else "append", 
+                                       batch_size=self.chunksize, relax=self.relax)
+                elapsed = time.perf_counter() - chunk_start
+                total_rows += rows
+                rate = rows / elapsed if elapsed > 0 else float("inf")
+                self.ingest_stats.append({"chunk": n, "rows": rows, "seconds": elapsed, "rows_per_s": rate})
+                print(f"    chunk {n}: {rows} rows in {elapsed:.3f}s ({rate:,.0f} rows/s)")
+                chunk_start = time.perf_counter()
+            elapsed = time.perf_counter() - start
+            rate = total_rows / elapsed if elapsed > 0 else float("inf")
+            print(f"    {total_rows} rows streamed in {elapsed:.3f}s ({rate:,.0f} rows/s)")
+        except Exception as e:
+            raise Exception(f"Error streaming CSV into database: {str(e)}")
+
+    def _datasheet_excel_stream(self, source_path, i):
+        '''Streams every sheet of an .xlsx file into the db with openpyxl in read-only mode, self.chunksize rows at a 
+        time, so memory is bounded by the chunk size and not by the workbook size. With sheet_workers > 1 the sheets 
+        are streamed by worker processes, each with its own connection that waits for the write lock'''
+        from openpyxl import load_workbook
+        _, source_name = os.path.split(source_path)
+        source_name, _ = os.path.splitext(source_name)
+        try:
+            workbook = load_workbook(source_path, read_only=True, data_only=True)
+            sheet_names = workbook.sheetnames
+            workbook.close()
+        except Exception as e:
+            raise Exception(f"Error opening Excel file: {str(e)}")
+        tables = []
+        for j, sheet_name in enumerate(sheet_names, start=1):  # Same naming as _datasheet_excel
+            table_name = self._sanitize_name(source_name if len(sheet_names) == 1 else sheet_name, i)
+            if not table_name[0].isalpha() and table_name[0] != '_':
+                table_name = f"xlsx_table{j}"
+                print(f"Invalid table name for sheet: *{sheet_name}*. Adding it as *{table_name}*")
+            tables.append((sheet_name, table_name))
+        print(f'Streaming data from *{source_name}* to {self.db_path}.')
+        print(f"Sheet(s) imported to db as table(s) with name(s):")
+        self.ingest_stats = []
+        start = time.perf_counter()
+        try:
+            if self.sheet_workers > 1 and len(tables) > 1 and self.db_path != ":memory:":
+                self.conn.commit()  # Release the lock for the workers
+                with ProcessPoolExecutor(max_workers=min(self.sheet_workers, len(tables))) as executor:
+                    futures = [executor.submit(_stream_excel_sheet, self.db_path, source_path, sheet_name, table_name, 
+                                               self.chunksize, self.relax) for sheet_name, table_name in tables]
+                    results = [future.result() for future in futures]
+            else:  # One workbook for every sheet, its shared strings are only parsed once
+                workbook = load_workbook(source_path, read_only=True, data_only=True)
+                try:
+                    results = [_stream_sheet(self.conn, workbook[sheet_name], table_name, self.chunksize, self.relax) 
+                               for sheet_name, table_name in tables]
+                finally:
+                    workbook.close()
+        except Exception as e:
+            raise Exception(f"Error streaming Excel file into database: {str(e)}")
+        for sheet_name, table_name, rows, seconds in results:
+            rate = rows / seconds if seconds > 0 else float("inf")
+            self.ingest_stats.append({"sheet": sheet_name, "table": table_name, "rows": rows, "seconds": seconds, "rows_per_s": rate})
+            print(f"    {table_name}: {rows} rows in {seconds:.3f}s ({rate:,.0f} rows/s)")
+        print(f"    {len(results)} sheet(s) streamed in {time.perf_counter() - start:.3f}s")
+
     def _datasheet_json(self, i):
         '''Specific method for sending .json files as tables in the db'''
         try:
@@ -275,10 +577,54 @@ class SQLite_Data_Extractor(SQLite_Handler):
             print(f"    {table_name}")
             
             # Insert into DB
-            self.df.to_sql(table_name, self.conn, if_exists='replace', index=False)
+            self._write_df(self.df, table_name, if_exists='replace', index=False)
         except Exception as e:
             raise Exception(f"Error connecting to database: {str(e)}")
 
+    def _datasheet_json_stream(self, source_path, i):
+        '''Streams a JSON file (a top-level array, or JSON lines) into the db. Records are decoded incrementally and 
+        flattened self.chunksize at a time, so memory is bounded by the chunk size. Columns that first appear in a 
+        later chunk are added to the table'''
+        from .bulk_writer import write_dataframe
+        _, source_name = os.path.split(source_path)
+        source_name, _ = os.path.splitext(source_name)
+        table_name = self._sanitize_name(source_name, i)
+        print(f'Streaming data from *{source_name}* to {self.db_path}.')
+        print(f"    {table_name}")
+        self.ingest_stats = []
+        try:
+            total_rows, n = 0, 0
+            start = chunk_start = time.perf_counter()
+            for batch in _batched(_iter_json_records(source_path), self.chunksize):
+                df = _merge_folded_columns(_clean_nested(_flatten_records(
+                    [record if isinstance(record, dict) else {"value": record} for record in batch])))
+                if n > 0:
+                    self._add_missing_columns(table_name, df)
+                rows = write_dataframe(self.conn, df, table_name, if_exists="replace" if n == 0 else "append", 
+                                       batch_size=self.chunksize, relax=self.relax)
+                elapsed = time.perf_counter() - chunk_start
+                total_rows += rows
+                rate = rows / elapsed if elapsed > 0 else float("inf")
+                self.ingest_stats.append({"chunk": n, "rows": rows, "seconds": elapsed, "rows_per_s": rate})
+                print(f"    chunk {n}: {rows} rows in {elapsed:.3f}s ({rate:,.0f} rows/s)")
+                n += 1
+                chunk_start = time.perf_counter()
+            elapsed = time.perf_counter() - start
+            rate = total_rows / elapsed if elapsed > 0 else float("inf")
+            print(f"    {total_rows} rows streamed in {elapsed:.3f}s ({rate:,.0f} rows/s)")
+        except Exception as e:
+            raise Exception(f"Error streaming JSON into database: {str(e)}")
+
+    def _add_missing_columns(self, table_name, df):
+        '''Adds the columns of df that the table doesn't have yet. Names are compared as SQLite does, ignoring ASCII 
+        case, so "Name" is written to an existing "name" column'''
+        from .bulk_writer import sqlite_type
+        columns = {_fold(column) for column in self.catalog.columns(table_name)}
+        for column, dtype in df.dtypes.items():
+            if _fold(str(column)) not in columns:
+                self.cursor.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{column}" {sqlite_type(dtype)};')
+        self.conn.commit()
+
     def _sanitize_name(self, source_name: str, i) -> str:
         table_name = re.sub(r'\W', '_', source_name)
         if not table_name[0].isalpha() and table_name[0] != '_':
@@ -292,4 +638,237 @@ class SQLite_Data_Extractor(SQLite_Handler):
             result = urlparse(string)
             return all([result.scheme, result.netloc])
         except ValueError:
-            return False
\ No newline at end of file
+            return False
+
+
+'''Internal functions'''
+def _read_source(source_path, sep=","):
+    '''Parses a supported file into pandas. Returns the extension and the parsed data (a dictionary of DataFrames for 
+    .xlsx files, None for unsupported filetypes). Kept at module level so it can run in worker processes'''
+    import pandas as pd
+    extension = source_path.split(".")[-1].lower()  # Get file extension, case-insensitive
+    df = None
+
+    match extension:
+        case "xlsx":
+            try:
+                df = pd.read_excel(source_path, sheet_name=None)  # Dictionary of DataFrames
+            except Exception as e:
+                raise Exception(f"Error importing Excel file into pandas: {str(e)}")
+
+        case "csv":
+            try:
+                df = pd.read_csv(source_path, header=0, sep=sep)
+            except Exception as e:
+                raise Exception(f"Error importing CSV into pandas: {str(e)}")
+
+        case "json":
+            try:
+                with open(source_path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+
+                df = pd.json_normalize(raw)
+                df = _clean_nested(df)
+
+                if df.empty or len(df.columns) == 0:
+                    raise Exception("El DataFrame resultante está vacío o no tiene columnas.")
+
+            except Exception as e:
+                raise Exception(f"Error importando JSON como DataFrame: {str(e)}")
+    return extension, df
+
+def _stream_excel_sheet(db_path, source_path, sheet_name, table_name, chunksize=100000, relax=False, timeout=60):
+    '''Worker task for the parallel Excel streaming: opens its own workbook and connection, which waits up to 
+    *timeout* seconds for the write lock, and streams one sheet'''
+    from openpyxl import load_workbook
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    workbook = load_workbook(source_path, read_only=True, data_only=True)
+    try:
+        return _stream_sheet(conn, workbook[sheet_name], table_name, chunksize, relax)
+    finally:
+        workbook.close()
+        conn.close()
+
+def _stream_sheet(conn, worksheet, table_name, chunksize=100000, relax=False):
+    '''Streams a read-only worksheet into a table in batches of *chunksize* rows, each written in its own transaction. 
+    The first row is the header and empty rows are skipped. Returns (sheet_name, table_name, rows, seconds)'''
+    import pandas as pd
+    from .bulk_writer import write_dataframe
+    start = time.perf_counter()
+    rows = worksheet.iter_rows(values_only=True)
+    header = _excel_header(next(rows, ()))
+    total, batch, n = 0, [], 0
+    if not header:  # Empty sheet
+        return worksheet.title, table_name, 0, time.perf_counter() - start
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        batch.append(row[:len(header)] + (None,) * (len(header) - len(row)))
+        if len(batch) == chunksize:
+            total += write_dataframe(conn, pd.DataFrame.from_records(batch, columns=header), table_name, 
+                                     if_exists="replace" if n == 0 else "append", batch_size=chunksize, relax=relax)
+            batch, n = [], n + 1
+    if batch or n == 0:  # Header-only sheets still get their (empty) table
+        total += write_dataframe(conn, pd.DataFrame.from_records(batch, columns=header), table_name, 
+                                 if_exists="replace" if n == 0 else "append", batch_size=chunksize, relax=relax)
+    return worksheet.title, table_name, total, time.perf_counter() - start
+
+def _excel_header(row):
+    '''Column names from a header row, named and deduplicated like pandas does'''
+    row = list(row)
+    while row and row[-1] is None:  # Read-only sheets can report extra empty cells
+        row.pop()
+    header, seen = [], {}
+    for k, value in enumerate(row):
+        name = f"Unnamed: {k}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+def _flatten_records(records, sep="."):
+    '''Column-wise json_normalize: builds the frame from the records in one go and then only expands the columns 
+    holding dicts, recursively, into "column.key" columns placed where the column was. Cells of such a column that 
+    aren't dicts stay in the original column'''
+    import numpy as np
+    import pandas as pd
+    df = pd.DataFrame.from_records(records) if records else pd.DataFrame()
+    for position, column in reversed(list(enumerate(df.columns))):
+        values = df[column]
+        if values.dtype != object:
+            continue
+        mask = np.fromiter((type(value) is dict for value in values.to_numpy()), bool, len(values))
+        if not mask.any():
+            continue
+        nested = _flatten_records([value if is_dict else {} for value, is_dict in zip(values.to_numpy(), mask)], sep)
+        nested.columns = [f"{column}{sep}{name}" for name in nested.columns]
+        nested.index = df.index
+        rest = values.where(~mask)
+        parts = [df.iloc[:, :position]] + ([rest.to_frame()] if rest.notna().any() else []) + [nested, df.iloc[:, position + 1:]]
+        df = pd.concat(parts, axis=1)
+    return df
+
+def _clean_nested(df):
+    '''Turns the lists left by json_normalize into comma-separated strings and the dicts into JSON text. Works column 
+    by column: columns without lists or dicts are left untouched and only the nested cells are converted'''
+    for column in df.columns:
+        values = df[column]
+        if values.dtype != object:
+            continue
+        types = set(map(type, values.to_numpy()))
+        if list not in types and dict not in types:
+            continue
+        values = values.to_numpy().copy()
+        for kind, convert in ((list, lambda value: ", ".join(str(v) for v in value)), 
+                              (dict, lambda value: json.dumps(value, ensure_ascii=False))):
+            if kind in types:
+                mask = [type(value) is kind for value in values]
+                values[mask] = [convert(value) for value in values[mask]]
+        df[column] = values
+    return df
+
+def _iter_json_records(source_path, read_size=1 << 20):
+    '''Yields the records of a JSON file without loading it whole: the elements of a top-level array, or every value 
+    of a JSON lines (or otherwise whitespace-separated) file. A single top-level object is yielded as one record. A 
+    file starting with "[" is read as JSON lines if another value follows the first one (lines of arrays)'''
+    decoder = json.JSONDecoder()
+    with open(source_path, "r", encoding="utf-8") as f:
+        buffer, pos, eof, layout = "", 0, False, None  # layout: "array", "lines", or "closed" after the array's "]"
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer) and eof:
+                return
+            decoded = False
+            if pos < len(buffer):
+                if layout is None:
+                    layout = _json_layout(decoder, buffer, pos, eof, read_size)
+                    if layout is not None:
+                        pos += layout == "array"
+                        continue
+                elif layout == "closed":
+                    raise ValueError("Unexpected data after the top-level JSON array")
+                elif layout == "array" and buffer[pos] == "]":
+                    layout = "closed"
+                    pos += 1
+                    continue
+                else:
+                    try:
+                        record, end = decoder.raw_decode(buffer, pos)
+                        decoded = end < len(buffer) or eof  # A number could be cut at the end of the buffer
+                    except ValueError:  # Incomplete value
+                        if eof:
+                            raise ValueError(f"Invalid JSON near character {pos} of the buffer")
+            if not decoded:  # Read more
+                chunk = f.read(max(read_size, len(buffer) - pos))  # Large records double the read
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield record
+            pos = end
+
+def _json_layout(decoder, buffer, pos, eof, read_size):
+    '''"array" or "lines" for a file whose first value starts at *pos*, None if more of the file is needed to tell. A 
+    first array bigger than *read_size* is streamed as a top-level array, anything after it is then an error'''
+    if buffer[pos] != "[":
+        return "lines"
+    try:
+        end = decoder.raw_decode(buffer, pos)[1]
+    except ValueError:  # Incomplete first value
+        return "array" if eof or len(buffer) - pos >= read_size else None
+    if buffer[end:].lstrip(" \t\r\n,"):
+        return "lines"
+    return "array" if eof else None
+
+def _merge_folded_columns(df):
+    '''Merges the columns whose names only differ in ASCII case, which SQLite takes for the same column, into the 
+    first of them'''
+    groups = {}
+    for column in df.columns:
+        groups.setdefault(_fold(str(column)), []).append(column)
+    for first, *others in (group for group in groups.values() if len(group) > 1):
+        for other in others:
+            df[first] = df[first].combine_first(df[other])
+        df = df.drop(columns=others)
+    return df
+
+def _batched(iterable, size):
+    '''Groups an iterable in lists of *size* elements'''
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _bounded_map(executor, function, items, window, ordered=True):
+    '''Yields function(*item) for every item, run on the executor with at most *window* tasks queued or running 
+    besides the result being consumed. Results come in the order of *items* or, with ordered=False, as they 
+    complete. The tasks not started are cancelled when the generator is closed'''
+    items = iter(items)
+    pending = deque(executor.submit(function, *item) for item in islice(items, window))
+    try:
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                future = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+                pending.remove(future)
+            result = future.result()
+            for item in islice(items, 1): # The next task starts while this result is consumed
+                pending.append(executor.submit(function, *item))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+def _parse_source(index, source_path, sep):
+    '''Worker task for the parallel ingestion: parses a file and times it'''
+    start = time.perf_counter()
+    extension, df = _read_source(source_path, sep)
+    return index, source_path, extension, df, time.perf_counter() - start
@@ -1,5 +1,9 @@
 #V22.0 17/04/2025
-import os, json, time, re, sys, shutil, sqlite3
+import os, json, time, re, sys, shutil, sqlite3, random
+from .sqlite_pool import SQLitePool, apply_profile
+from .query_cache import QueryCache
+from .schema_catalog import SchemaCatalog
+from .instrumentation import Instrumentation
 ################################################################################
 
 class SQLite_Handler:
@@ -7,6 +11,11 @@ class SQLite_Handler:
 
     def __init__(self, db_name: str, db_folder_path: str = None, rel_path: bool = False):
         base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.profile = None
+        self.pool = None
+        self.cache = None
+        self._catalog = None
+        self.instrumentation = None
         # Memory database shortcut
         if db_name == ":memory:":
             self.db_path = ":memory:"
@@ -55,10 +64,71 @@ class SQLite_Handler:
         foreign_keys = "ON" if foreign_keys == True else "OFF"
         self.cursor.execute(f"PRAGMA foreign_keys = {foreign_keys}")
 
+    def set_profile(self, profile: str, verbose=True):
+        '''Applies a named PRAGMA profile ("bulk-load", "read-heavy", "durable") to the connection. It is applied again 
+        on every reconnect'''
+        apply_profile(self.conn, profile)
+        self.profile = profile
+        print(f"PRAGMA profile set to *{profile}*") if verbose else None
+
+    def open_pool(self, readers: int = 4, profile: str = None, verbose=True):
+        '''Opens a connection pool (one writer plus *readers* readers) on the database for multi-threaded use. Check 
+        connections out with "with handler.pool.reader() as conn:" or "with handler.pool.writer() as conn:"'''
+        if self.pool is not None:
+            self.pool.close()
+        profile = profile or self.profile or "read-heavy"
+        self.pool = SQLitePool(self.db_path, readers, profile)
+        print(f"Connection pool opened: 1 writer, {readers} reader(s), profile *{profile}*") if verbose else None
+        return self.pool
+
+    def close_pool(self):
+        '''Closes the connection pool if there is one'''
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def enable_cache(self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024, verbose=True):
+        '''Caches the results of the read methods (retrieve, filter_rows_by_tags). Entries are evicted LRU by count and 
+        size and the cache is invalidated whenever the database changes, from this or any other connection'''
+        self.cache = QueryCache(max_entries, max_bytes)
+        print(f"Query cache enabled: {max_entries} entries, {max_bytes / (1024 * 1024):.0f} MB") if verbose else None
+
+    def disable_cache(self):
+        self.cache = None
+
+    def cache_stats(self):
+        '''Hit, miss, eviction and invalidation counters of the query cache'''
+        return self.cache.stats() if self.cache is not None else None
+
+    def enable_instrumentation(self, sink="memory", slow_ms: float = 100, trace_sql: bool = True, verbose=True):
+        '''Times every public method (wall, CPU, rows returned or changed) and every SQL statement of the connection. 
+        Events go to the *sink*: "memory", a JSON lines file path or a callable. Statements slower than *slow_ms* are 
+        logged as slow queries. Nothing is wrapped or hooked while it is disabled'''
+        self.disable_instrumentation()
+        self.instrumentation = Instrumentation(self, sink, slow_ms, trace_sql)
+        self.instrumentation.attach()
+        print(f"Instrumentation enabled, slow query threshold {slow_ms} ms") if verbose else None
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        if self.instrumentation is not None:
+            self.instrumentation.detach()
+            self.instrumentation = None
+
+    def instrumentation_stats(self):
+        '''Statement aggregates, slow queries and, with the memory sink, per-method aggregates'''
+        return self.instrumentation.stats() if self.instrumentation is not None else None
+
+    @property
+    def catalog(self):
+        '''Schema catalog of the connection, created on first use and again after a reconnect'''
+        if self._catalog is None or self._catalog.conn is not self.conn:
+            self._catalog = SchemaCatalog(self.conn)
+        return self._catalog
+
     def get_table_info(self, table_name: str):
         '''Uses PRAGMA to show table info'''
-        self.cursor.execute(f"PRAGMA table_info({table_name});")
-        rows = self.cursor.fetchall()
+        rows = self.catalog.table_info(table_name)
         print("\nTable schema:")
         for row in rows:
             print(row)
@@ -82,17 +152,24 @@ class SQLite_Handler:
                 print(f"    {table}")
         return tables
 
-    def examine_table(self, table_name: str):
-        '''Prints the desired table or tables if given in list or tuple format'''
+    def examine_table(self, table_name: str, limit: int = None, mode: str = "head"):
+        '''Prints the desired table or tables if given in list or tuple format. With *limit* only a preview of that 
+        many rows is printed (see preview_table) and the row count is estimated instead of counted'''
         table_name = self._input_handler(table_name)
         try:
             cursor = self.conn.cursor()
             for i, table in enumerate(table_name):
                 print(f"table {i+1}: {table}")
+                if limit is not None:
+                    rows = self.estimate_row_count(table)
+                    print(f"    Rows: ~{rows}\n    Columns: {len(self.catalog.columns(table))}")
+                    print(f"Columns name: {tuple(self.catalog.columns(table))}")
+                    for row in self.preview_table(table, limit, mode, verbose=False):
+                        print(f"    {row}")
+                    continue
                 cursor.execute(f"SELECT COUNT(*) FROM {table}")
                 rows = cursor.fetchone()[0]
-                cursor.execute(f"PRAGMA table_info({table})")
-                columns = cursor.fetchall()
+                columns = self.catalog.table_info(table)
                 columns_number = len(columns)
                 column_names = []  # Preallocation
                 for column in columns:  # Get column names
@@ -108,6 +185,72 @@ class SQLite_Handler:
         except Exception as e:
             raise Exception(f"Error while examining tables: {str(e)}")
 
+    def preview_table(self, table_name: str, n: int = 10, mode: str = "head", columns: list = None, verbose=True):
+        '''Returns n rows of a table without reading the rest of it. mode: "head" (first rows), "tail" (last rows) or 
+        "sample" (random rows, picked by rowid seeks when the table has a rowid)'''
+        select = ", ".join(f'"{column}"' for column in columns) if columns else "*"
+        has_rowid = self._has_rowid(table_name)
+        try:
+            if mode == "head":
+                rows = self.conn.execute(f'SELECT {select} FROM "{table_name}" LIMIT ?', (n,)).fetchall()
+            elif mode == "tail":
+                if has_rowid:
+                    rows = self.conn.execute(f'SELECT {select} FROM "{table_name}" ORDER BY rowid DESC LIMIT ?', (n,)).fetchall()[::-1]
+                else:
+                    offset = max(self.conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0] - n, 0)
+                    rows = self.conn.execute(f'SELECT {select} FROM "{table_name}" LIMIT ? OFFSET ?', (n, offset)).fetchall()
+            elif mode == "sample":
+                rows = self._sample_rows(table_name, n, select) if has_rowid else \
+                    self.conn.execute(f'SELECT {select} FROM "{table_name}" ORDER BY random() LIMIT ?', (n,)).fetchall()
+            else:
+                raise ValueError(f"Unsupported preview mode *{mode}*: Try head, tail, sample.")
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error while previewing table: {str(e)}")
+        if verbose:
+            print(f"{mode} of *{table_name}* ({len(rows)} row(s)):")
+            for row in rows:
+                print(f"    {row}")
+        return rows
+
+    def page_table(self, table_name: str, page_size: int = 100, after=None, key: str = "rowid", columns: list = None):
+        '''Keyset pagination: returns (rows, last_key) for the page_size rows whose *key* is greater than *after*. Pass 
+        last_key back as *after* to get the next page; it is None once the table is exhausted. *key* must be unique 
+        and should be indexed (rowid or the primary key)'''
+        select = ", ".join(f'"{column}"' for column in columns) if columns else "*"
+        key_sql = key if key == "rowid" else f'"{key}"'
+        where = f"WHERE {key_sql} > ?" if after is not None else ""
+        params = (after, page_size) if after is not None else (page_size,)
+        try:
+            rows = self.conn.execute(
+                f'SELECT {key_sql}, {select} FROM "{table_name}" {where} ORDER BY {key_sql} LIMIT ?', params).fetchall()
+        except Exception as e:
+            raise Exception(f"Error while paging table: {str(e)}")
+        last_key = rows[-1][0] if len(rows) == page_size else None
+        return [row[1:] for row in rows], last_key
+
+    def estimate_row_count(self, table_name: str) -> int:
+        '''Approximate row count without a full scan. Uses the ANALYZE statistics in sqlite_stat1 if there are any, 
+        else the rowid span (exact until rows are deleted) and only counts WITHOUT ROWID tables'''
+        try:
+            stat = self.conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,)).fetchone()
+        except sqlite3.OperationalError:  # No ANALYZE run yet
+            stat = None
+        if stat is not None:
+            return int(stat[0].split()[0])
+        if self._has_rowid(table_name):
+            low, high = self.conn.execute(f'SELECT (SELECT min(rowid) FROM "{table_name}"), (SELECT max(rowid) FROM "{table_name}")').fetchone()
+            return 0 if high is None else high - low + 1
+        return self.conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+
+    def analyze(self, table_name: str = None, verbose=True):
+        '''Runs ANALYZE (on one table or the whole database) to refresh the statistics used by estimate_row_count and 
+        the query planner'''
+        self.cursor.execute(f'ANALYZE "{table_name}";' if table_name else "ANALYZE;")
+        self.conn.commit()
+        print(f"Statistics updated for *{table_name or 'all tables'}*") if verbose else None
+
     def rename_table(self, old_name: str, new_name: str, verbose=True):
         old_name = re.sub(r'\W', '_', old_name)  # To avoid illegal symbols
         new_name = re.sub(r'\W', '_', new_name)
@@ -155,10 +298,8 @@ class SQLite_Handler:
             print(f"Warning: This action will drop row(s) from {table_name}.")
             confirmation = input("Do you want to continue? (y/n): ").strip().lower()
             if confirmation == 'y':
+                column_name = self.catalog.columns(table_name)[0]
                 for row in row_name:
-                    self.cursor.execute(f"PRAGMA table_info({table_name})")
-                    columns_info = self.cursor.fetchall()
-                    column_name = columns_info[0][1]
                     self.cursor.execute(f"DELETE FROM {table_name} WHERE {column_name} = '{row}'")
                     self.conn.commit()
                     print(f"{row} dropped successfully.")
@@ -169,9 +310,52 @@ class SQLite_Handler:
         except Exception as e:
             raise Exception(f"Error while deleting row(s): {str(e)}")
 
+    def delete_rows(self, keys, table_name: str, column_name: str = None, override=False, verbose=True):
+        '''Drops every row whose *column_name* (the first column by default) is in *keys*. The keys can be a str, any
+        iterable, a Series or a DataFrame (its *column_name* column, or its first one). They are loaded into a temp
+        table and deleted with a single statement in one transaction. Returns the requested and deleted counts'''
+        if isinstance(keys, str):
+            keys = [keys]
+        elif hasattr(keys, "columns"):  # DataFrame
+            keys = keys[column_name] if column_name in keys.columns else keys.iloc[:, 0]
+        if hasattr(keys, "tolist"):  # Series and arrays, as Python scalars
+            keys = keys.tolist()
+        keys = list(dict.fromkeys(keys))
+        columns = self.catalog.columns(table_name)
+        if not columns:
+            raise ValueError(f"Table *{table_name}* not found")
+        column_name = column_name or columns[0]
+        if column_name.lower() not in {column.lower() for column in columns}:  # A quoted unknown name is a string literal
+            raise ValueError(f"Column *{column_name}* not found in table *{table_name}*")
+        if not override:
+            confirmation = input(f"Warning: This action will drop up to {len(keys)} row(s) from {table_name}.\nDo you want to continue? (y/n): ").strip().lower()
+            if confirmation != 'y':
+                print("Operation canceled.")
+                return {"requested": len(keys), "deleted": 0}
+        try:
+            # A savepoint commits on release unless the caller has a transaction open, which is left to them
+            self.cursor.execute("SAVEPOINT delete_rows")
+            try:
+                self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _delete_keys (key PRIMARY KEY);")
+                self.cursor.execute("DELETE FROM temp._delete_keys;")
+                self.cursor.executemany("INSERT OR IGNORE INTO temp._delete_keys (key) VALUES (?);", ((key,) for key in keys))
+                self.cursor.execute(f'DELETE FROM "{table_name}" WHERE "{column_name}" IN (SELECT key FROM temp._delete_keys);')
+                deleted = self.cursor.rowcount
+                self.cursor.execute("DROP TABLE temp._delete_keys;")
+            except Exception:
+                self.cursor.execute("ROLLBACK TO delete_rows")
+                raise
+            finally:
+                self.cursor.execute("RELEASE delete_rows")
+        except Exception as e:
+            raise Exception(f"Error while deleting row(s): {str(e)}")
+        print(f"{deleted} row(s) deleted from table *{table_name}* ({len(keys)} key(s) requested)") if verbose else None
+        return {"requested": len(keys), "deleted": deleted}
+
     def close_conn(self, verbose=True):
         '''Closes the database connection when done'''
         try:
+            self.close_pool()
             self.conn.close()
             print(f"Closed connection to: {self.db_path}") if verbose else None
         except Exception as e:
@@ -196,6 +380,8 @@ class SQLite_Handler:
         try:
             self.conn = sqlite3.connect(self.db_path)
             self.cursor = self.conn.cursor()
+            if self.profile is not None:
+                apply_profile(self.conn, self.profile)
             print(f"Connected to {self.db_path}") if verbose else None
         except Exception as e:
             print(f"Error trying to connect: {e}")
@@ -223,6 +409,41 @@ class SQLite_Handler:
             print(f"Error clearing the database: {str(e)}")
 
     """Internal methods"""
+    def _cached(self, sql, params, compute, variant=None):
+        '''Returns compute() through the query cache if it is enabled. Callers get a copy of the cached value'''
+        if self.cache is None:
+            return compute()
+        self.cache.validate(self.conn)
+        key = self.cache.key(sql, params, variant)
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            self.cache.put(key, value)
+        return value.copy() if hasattr(value, "copy") else list(value)
+
+    def _has_rowid(self, table_name):
+        try:
+            self.conn.execute(f'SELECT rowid FROM "{table_name}" LIMIT 0')
+            return True
+        except sqlite3.OperationalError:  # WITHOUT ROWID table
+            return False
+
+    def _sample_rows(self, table_name, n, select):
+        '''Random rows by seeking to random rowids between min and max, so only n index lookups are made'''
+        low, high = self.conn.execute(f'SELECT (SELECT min(rowid) FROM "{table_name}"), (SELECT max(rowid) FROM "{table_name}")').fetchone()
+        if high is None:
+            return []
+        if high - low + 1 <= n:
+            return self.conn.execute(f'SELECT {select} FROM "{table_name}"').fetchall()
+        query = f'SELECT rowid, {select} FROM "{table_name}" WHERE rowid >= ? ORDER BY rowid LIMIT 1'
+        rows = {}
+        for _ in range(n * 4):  # Gaps left by deletes make some seeks land on the same row
+            row = self.conn.execute(query, (random.randint(low, high),)).fetchone()
+            rows[row[0]] = row[1:]
+            if len(rows) == n:
+                break
+        return [rows[rowid] for rowid in sorted(rows)]
+
     def _input_handler(self, input):
         '''Modifies the input parameter to handle several types and always return an iterable'''
         if isinstance(input, str):
@@ -0,0 +1,98 @@
+import queue, sqlite3, threading
+from contextlib import contextmanager
+
+# Named PRAGMA sets applied on connect. Every profile uses WAL so the readers don't block on the writer
+PRAGMA_PROFILES = {
+    "bulk-load": {  # Big imports: durability traded for speed, a crash can lose the last transactions
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,  # 256 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    "read-heavy": {  # Dashboards and services: memory-mapped reads and a large page cache
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,  # 64 MiB
+        "mmap_size": 268435456,  # 256 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "durable": {  # Every commit is synced before returning
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+
+def apply_profile(conn, profile: str):
+    '''Applies a named PRAGMA profile to a connection'''
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown PRAGMA profile: {profile}. Try {', '.join(PRAGMA_PROFILES)}.")
+    for pragma, value in PRAGMA_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {pragma} = {value}").fetchall()
+
+class SQLitePool:
+    '''Thread-safe connection pool: one writer connection, serialized with a lock, plus *readers* read-only 
+    connections checked out from a queue. In WAL mode the readers run concurrently with each other and the writer.'''
+
+    def __init__(self, db_path: str, readers: int = 4, profile: str = "read-heavy", timeout: float = 30):
+        if db_path == ":memory:":
+            raise ValueError("In-memory databases can't be shared by a connection pool")
+        if readers < 1:
+            raise ValueError("The pool needs at least one reader")
+        self.db_path = db_path
+        self.profile = profile
+        self.timeout = timeout  # Seconds to wait for a free connection
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        self._readers = queue.Queue()
+        self._all_readers = []
+        for _ in range(readers):
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._readers.put(conn)
+            self._all_readers.append(conn)
+        self.closed = False
+
+    @contextmanager
+    def writer(self):
+        '''Checks out the writer connection. Commits when the block ends, rolls back on error'''
+        if not self._write_lock.acquire(timeout=self.timeout):
+            raise TimeoutError("Timed out waiting for the writer connection")
+        try:
+            yield self._writer
+            self._writer.commit()
+        except Exception:
+            self._writer.rollback()
+            raise
+        finally:
+            self._write_lock.release()
+
+    @contextmanager
+    def reader(self):
+        '''Checks out a read-only connection'''
+        try:
+            conn = self._readers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a reader connection")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def close(self):
+        '''Closes every connection of the pool'''
+        with self._write_lock:
+            self._writer.close()
+        for conn in self._all_readers:
+            conn.close()
+        self.closed = True
+
+    '''Internal methods'''
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        apply_profile(conn, self.profile)
+        return conn
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from db_tools import AsyncHandler, SQLite_Handler
+
+ENDLESS = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c"
+
+class SlowWriter(SQLite_Handler):
+    def insert_then_hang(self):
+        '''Leaves a write transaction open and then runs a statement that never ends'''
+        self.conn.execute("INSERT INTO t VALUES (-1)")
+        self.conn.execute(ENDLESS).fetchall()
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = SlowWriter(str(tmp_path / "async.db"))
+    handler.conn.execute("CREATE TABLE t (a INTEGER)")
+    handler.conn.commit()
+    yield handler
+    handler.close_conn(verbose=False)
+
+async def started(worker):
+    while worker.current is None:
+        await asyncio.sleep(0.01)
+
+def test_concurrent_writes_are_serialized(handler):
+    async def main():
+        async with AsyncHandler(handler, readers=2, profile="read-heavy") as db:
+            await asyncio.gather(*(db.execute("INSERT INTO t VALUES (?)", (i,)) for i in range(50)),
+                                 *(db.fetchall("SELECT count(*) FROM t") for _ in range(20)))
+            assert await db.fetchall("SELECT count(*), sum(a) FROM t") == [(50, sum(range(50)))]
+    asyncio.run(main())
+
+def test_readers_are_read_only(handler):
+    async def main():
+        async with AsyncHandler(handler, readers=1) as db:
+            await db.execute("INSERT INTO t VALUES (1)")
+            with pytest.raises(Exception, match="readonly"):
+                await db.read("delete_rows", [1], "t", "a", override=True)
+            assert await db.fetchall("SELECT count(*) FROM t") == [(1,)]
+    asyncio.run(main())
+
+def test_cancel_interrupts_query_and_keeps_loop_free(handler):
+    async def main():
+        async with AsyncHandler(handler, readers=1) as db:
+            ticks = 0
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+            ticking = asyncio.create_task(ticker())
+            task = asyncio.create_task(db.fetchall(ENDLESS))
+            await started(db.readers[0])
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            ticking.cancel()
+            assert ticks > 5
+            assert await db.fetchall("SELECT 1") == [(1,)]  # The reader was interrupted, not stuck
+    asyncio.run(main())
+
+def test_cancelled_write_is_rolled_back(handler):
+    async def main():
+        async with AsyncHandler(handler) as db:
+            task = asyncio.create_task(db.call("insert_then_hang"))
+            await started(db.writer)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await db.execute("INSERT INTO t VALUES (1)")
+            assert await db.fetchall("SELECT a FROM t") == [(1,)]
+    asyncio.run(main())
+
+def test_iterate_batches(handler):
+    async def main():
+        async with AsyncHandler(handler) as db:
+            await db.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(2500)])
+            sizes = [len(rows) async for rows in db.iterate("SELECT a FROM t", batch_size=1000)]
+            assert sizes == [1000, 1000, 500]
+    asyncio.run(main())
+
+def test_instrumented_handler(handler):
+    handler.enable_instrumentation(verbose=False)
+    async def main():
+        async with AsyncHandler(handler) as db:
+            await db.call("consult_tables")
+            await db.read("consult_tables")
+    asyncio.run(main())
+    handler.disable_instrumentation()
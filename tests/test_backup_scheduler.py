@@ -0,0 +1,84 @@
+import os, sqlite3, threading
+import pytest
+from db_tools import SQLite_Backup
+from db_tools.backup_scheduler import BackupScheduler
+
+class FakeBackup:
+    '''Stands in for SQLite_Backup: always due, and its backup blocks until released'''
+    def __init__(self, name, tracker, release):
+        self.db_path = name
+        self.engine = "online"
+        self.tracker = tracker
+        self.release = release
+        self.pruned = []
+
+    def time_to_backup(self):
+        return 0
+
+    def _auto_backup(self, db_path):
+        with self.tracker["lock"]:
+            self.tracker["running"] += 1
+            self.tracker["peak"] = max(self.tracker["peak"], self.tracker["running"])
+            self.tracker["started"].append(db_path)
+        self.release.wait(5)
+        with self.tracker["lock"]:
+            self.tracker["running"] -= 1
+
+    def prune_backups(self, keep):
+        self.pruned.append(keep)
+
+@pytest.fixture
+def tracker():
+    return {"lock": threading.Lock(), "running": 0, "peak": 0, "started": []}
+
+def test_concurrency_limit_and_no_double_submission(tracker):
+    release = threading.Event()
+    scheduler = BackupScheduler(max_concurrent=2, keep=3)
+    backups = [FakeBackup(f"db{i}", tracker, release) for i in range(4)]
+    for backup in backups:
+        scheduler.add(backup)
+    assert len(scheduler.run_pending()) == 4
+    assert scheduler.run_pending() == []  # Still running or queued
+    release.set()
+    scheduler.stop(wait=True)
+    assert tracker["peak"] == 2
+    assert sorted(tracker["started"]) == [f"db{i}" for i in range(4)]
+    assert all(backup.pruned == [3] for backup in backups)
+
+def test_waits_are_jittered_within_bounds(monkeypatch):
+    scheduler = BackupScheduler(interval=10, jitter=0.2)
+    waits = []
+    def wait(seconds):
+        waits.append(seconds)
+        if len(waits) == 200:
+            scheduler._stop_event.set()
+    monkeypatch.setattr(scheduler._stop_event, "wait", wait)
+    scheduler._loop()
+    assert all(8 <= seconds <= 12 for seconds in waits)
+    assert len(set(waits)) > 1
+
+def test_rejects_invalid_settings():
+    for kwargs in ({"interval": 0}, {"jitter": 1}, {"max_concurrent": 0}):
+        with pytest.raises(ValueError):
+            BackupScheduler(**kwargs)
+
+def test_scheduled_backup_and_prune(tmp_path, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda *args: "y")
+    conn = sqlite3.connect(tmp_path / "scheduled.db")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+    backup = SQLite_Backup(str(tmp_path / "scheduled.db"), backup_folder=str(tmp_path / "backup"), backup_time=0)
+    scheduler = BackupScheduler(keep=1)
+    try:
+        scheduler.add(backup)
+        assert backup.engine == "online"  # The copy engine can't run off the connection's thread
+        old = [f"scheduled_backup_{year}y-01m-01d_0h-00m-00s.db" for year in (2020, 2021)]
+        for name in old:
+            open(os.path.join(backup.backup_folder, name), "wb").close()
+        assert scheduler.run_pending() == [backup]
+        scheduler.stop(wait=True)
+        names = backup.list_backups()
+        assert len(names) == 1 and names[0] not in old
+    finally:
+        backup.close_conn(verbose=False)
@@ -0,0 +1,48 @@
+import sqlite3
+import pandas as pd
+import pytest
+from db_tools.bulk_writer import write_dataframe
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "bulk.db")
+    yield conn
+    conn.close()
+
+def test_names_with_quotes(conn):
+    df = pd.DataFrame({'we"ird': [1, 2], "plain": ["a", None]})
+    assert write_dataframe(conn, df, 'ta"ble') == 2
+    assert conn.execute('SELECT "we""ird", plain FROM "ta""ble"').fetchall() == [(1, "a"), (2, None)]
+
+def test_same_rows_as_to_sql(conn):
+    df = pd.DataFrame({"i": [1, 2, 3], "f": [0.5, None, 2.0], "s": ["x", "y", None], "b": [True, False, True]})
+    write_dataframe(conn, df, "bulk", batch_size=2)
+    df.to_sql("pandas", conn, index=False)
+    assert conn.execute("SELECT * FROM bulk").fetchall() == conn.execute("SELECT * FROM pandas").fetchall()
+
+def test_append_and_fail(conn):
+    df = pd.DataFrame({"a": [1]})
+    write_dataframe(conn, df, "t")
+    write_dataframe(conn, df, "t", if_exists="append")
+    assert conn.execute("SELECT count(*) FROM t").fetchone() == (2,)
+    with pytest.raises(ValueError):
+        write_dataframe(conn, df, "t", if_exists="fail")
+
+def test_open_transaction_is_not_committed(conn):
+    conn.execute("CREATE TABLE other (a)")
+    conn.commit()
+    conn.execute("INSERT INTO other VALUES (1)")  # Open transaction of the caller
+    write_dataframe(conn, pd.DataFrame({"a": [1, 2]}), "t", relax=True)
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT count(*) FROM other").fetchone() == (0,)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 't'").fetchone() is None
+
+def test_failed_write_keeps_previous_table(conn):
+    write_dataframe(conn, pd.DataFrame({"a": [1]}), "t")
+    conn.execute("CREATE TRIGGER reject BEFORE INSERT ON t WHEN NEW.a = 3 BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+    conn.commit()
+    with pytest.raises(sqlite3.IntegrityError):
+        write_dataframe(conn, pd.DataFrame({"a": [2, 3]}), "t", if_exists="append")
+    assert not conn.in_transaction
+    assert conn.execute("SELECT a FROM t").fetchall() == [(1,)]
@@ -0,0 +1,76 @@
+import os, sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from db_tools import SQLite_Backup
+from db_tools import sqlite_backup
+
+@pytest.fixture(params=["wal", "delete"])
+def backup(tmp_path, monkeypatch, request):
+    monkeypatch.setattr("builtins.input", lambda *args: "y")
+    db_path = tmp_path / "packed.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA journal_mode = {request.param}")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO items (payload) VALUES (?)", [(f"item{i}" * 20,) for i in range(5000)])
+    conn.commit()
+    conn.close()
+    backup = SQLite_Backup(str(db_path), backup_folder=str(tmp_path / "backup"))
+    yield backup
+    backup.close_conn(verbose=False)
+
+def dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return list(conn.iterdump())
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize("compression, extension", [("lzma", ".db.xz"), ("zstd", ".db.zst")])
+@pytest.mark.parametrize("engine", ["copy", "online"])
+def test_compressed_backup_restores(backup, tmp_path, engine, compression, extension):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    backup.set_backup_rules(engine=engine, compression=compression, verbose=False)
+    backup.cursor.execute("UPDATE items SET payload = 'changed' WHERE id % 7 = 0")
+    backup.conn.commit()  # In WAL mode still in the WAL, the snapshot has to include it
+    expected = dump(backup.db_path)
+    result = backup.manual_backup()
+    assert result["backup_path"].endswith(extension)
+    assert result["bytes"] < os.path.getsize(backup.db_path)
+    assert not [name for name in os.listdir(backup.backup_folder) if name.endswith((".part", ".tmp"))]
+    target = str(tmp_path / "restored.db")
+    backup.promote(db_name=target, backup_name=os.path.basename(result["backup_path"]))
+    assert dump(target) == expected
+
+def test_rollback_journal_is_streamed_without_a_copy(backup, monkeypatch):
+    if backup.cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        pytest.skip("WAL databases are copied first")
+    def no_copy(*args, **kwargs):
+        raise AssertionError("the compressor should read the database file")
+    monkeypatch.setattr(sqlite_backup.tempfile, "mkstemp", no_copy)
+    backup.set_backup_rules(engine="online", compression="lzma")
+    assert backup.manual_backup()["backup_path"].endswith(".db.xz")
+
+def test_concurrent_backups_in_one_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda *args: "y")
+    backups = []
+    for name in ("a", "b"):
+        conn = sqlite3.connect(tmp_path / f"{name}.db")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, payload TEXT)")
+        conn.executemany("INSERT INTO items (payload) VALUES (?)", [(f"{name}{i}" * 50,) for i in range(3000)])
+        conn.commit()
+        conn.close()
+        backup = SQLite_Backup(str(tmp_path / f"{name}.db"), backup_folder=str(tmp_path / "backup"), pages=5, sleep=0.001)
+        backup.set_backup_rules(engine="online", compression="lzma")
+        backups.append(backup)
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(lambda backup: backup._backup(backup.db_path), backups))
+        for backup, result in zip(backups, results):
+            target = str(tmp_path / f"restored_{os.path.basename(backup.db_path)}")
+            backup.promote(db_name=target, backup_name=os.path.basename(result["backup_path"]))
+            assert dump(target) == dump(backup.db_path)
+    finally:
+        for backup in backups:
+            backup.close_conn(verbose=False)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from db_tools import SQLite_Handler
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = SQLite_Handler(str(tmp_path / "delete.db"))
+    handler.cursor.execute("CREATE TABLE items (name TEXT, owner INTEGER)")
+    handler.cursor.executemany("INSERT INTO items VALUES (?, ?)", [(f"n{i}", i % 4) for i in range(100)])
+    handler.conn.commit()
+    yield handler
+    handler.close_conn(verbose=False)
+
+def remaining(handler):
+    return handler.cursor.execute("SELECT count(*) FROM items").fetchone()[0]
+
+def test_counts_on_first_column(handler):
+    result = handler.delete_rows(["n1", "n2", "n2", "missing"], "items", override=True, verbose=False)
+    assert result == {"requested": 3, "deleted": 2}  # Duplicates are requested once
+    assert remaining(handler) == 98
+
+def test_single_string_key(handler):
+    assert handler.delete_rows("n5", "items", override=True, verbose=False) == {"requested": 1, "deleted": 1}
+
+@pytest.mark.parametrize("keys", [np.array([0, 1]), pd.Series([0, 1]), pd.DataFrame({"other": [9, 9], "owner": [0, 1]})])
+def test_array_series_and_dataframe_keys(handler, keys):
+    result = handler.delete_rows(keys, "items", column_name="owner", override=True, verbose=False)
+    assert result == {"requested": 2, "deleted": 50}
+    assert remaining(handler) == 50
+
+def test_cancelled_deletes_nothing(handler, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda *args: "n")
+    assert handler.delete_rows(["n1"], "items", verbose=False) == {"requested": 1, "deleted": 0}
+    assert remaining(handler) == 100
+
+def test_unknown_column_is_rejected(handler):
+    with pytest.raises(ValueError, match="nope"):  # Quoted, SQLite would compare the literal 'nope' to the keys
+        handler.delete_rows(["nope"], "items", column_name="nope", override=True, verbose=False)
+    assert remaining(handler) == 100
+
+def test_failure_rolls_back(handler):
+    handler.cursor.execute("CREATE TRIGGER items_guard BEFORE DELETE ON items WHEN OLD.name = 'n2' "
+                           "BEGIN SELECT RAISE(ABORT, 'guarded'); END")
+    handler.conn.commit()
+    with pytest.raises(Exception, match="Error while deleting"):
+        handler.delete_rows(["n1", "n2"], "items", override=True, verbose=False)
+    assert remaining(handler) == 100
+    assert handler.delete_rows(["n1"], "items", override=True, verbose=False)["deleted"] == 1  # Temp table left usable
+
+def test_caller_transaction_is_not_committed(handler):
+    handler.cursor.execute("INSERT INTO items VALUES ('pending', 9)")  # Opens the caller's transaction
+    assert handler.delete_rows(["n1"], "items", override=True, verbose=False)["deleted"] == 1
+    assert handler.conn.in_transaction
+    handler.conn.rollback()  # Undoes both, the delete was part of the caller's transaction
+    assert remaining(handler) == 100
+
+def test_failure_keeps_caller_transaction(handler):
+    handler.cursor.execute("CREATE TRIGGER items_guard BEFORE DELETE ON items WHEN OLD.name = 'n2' "
+                           "BEGIN SELECT RAISE(ABORT, 'guarded'); END")
+    handler.conn.commit()
+    handler.cursor.execute("INSERT INTO items VALUES ('pending', 9)")
+    with pytest.raises(Exception, match="Error while deleting"):
+        handler.delete_rows(["n1", "n2"], "items", override=True, verbose=False)
+    assert handler.conn.in_transaction
+    handler.conn.commit()
+    assert remaining(handler) == 101
@@ -0,0 +1,31 @@
+import pytest
+from db_tools import SQLite_Handler, SQLite_Data_Extractor
+
+@pytest.fixture(params=[SQLite_Handler, SQLite_Data_Extractor])
+def handler(tmp_path, request):
+    if request.param is SQLite_Data_Extractor:
+        handler = SQLite_Data_Extractor(str(tmp_path / "examine.db"), source_folder_path=str(tmp_path / "data"))
+    else:
+        handler = SQLite_Handler(str(tmp_path / "examine.db"))
+    handler.cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    handler.cursor.executemany("INSERT INTO items (name) VALUES (?)", [(f"n{i}",) for i in range(1, 101)])
+    handler.conn.commit()
+    yield handler
+    handler.close_conn(verbose=False)
+
+@pytest.mark.parametrize("mode, rows", [("head", ["(1, 'n1')", "(2, 'n2')", "(3, 'n3')"]), 
+                                        ("tail", ["(98, 'n98')", "(99, 'n99')", "(100, 'n100')"])])
+def test_preview_prints_only_the_limit(handler, capsys, mode, rows):
+    capsys.readouterr()
+    handler.examine_table("items", limit=3, mode=mode)
+    out = capsys.readouterr().out
+    assert "Rows: ~100" in out
+    printed = [line.strip() for line in out.splitlines() if line.startswith("    (")]
+    assert sorted(printed) == sorted(rows)
+
+def test_without_limit_prints_everything(handler, capsys):
+    capsys.readouterr()
+    handler.examine_table("items")
+    out = capsys.readouterr().out
+    assert "Rows: 100" in out
+    assert len([line for line in out.splitlines() if line.startswith("    (")]) == 100
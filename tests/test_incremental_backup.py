@@ -0,0 +1,144 @@
+import os, json, sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from db_tools import SQLite_Backup
+from db_tools import sqlite_backup
+
+@pytest.fixture
+def backup(tmp_path, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda *args: "y")
+    db_path = tmp_path / "chain.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO items (payload) VALUES (?)", [(f"item{i}" * 20,) for i in range(5000)])
+    conn.commit()
+    conn.close()
+    backup = SQLite_Backup(str(db_path), backup_folder=str(tmp_path / "backup"), engine="incremental")
+    yield backup
+    backup.close_conn(verbose=False)
+
+def dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return list(conn.iterdump())
+    finally:
+        conn.close()
+
+def restore(backup, tmp_path, name):
+    target = str(tmp_path / f"restored_{len(os.listdir(tmp_path))}.db")
+    backup.promote(db_name=target, backup_name=name)
+    return dump(target)
+
+def test_chain_restores_every_link_including_shrink(backup, tmp_path):
+    states = {backup.list_backups()[0]: dump(backup.db_path)}
+    backup.cursor.execute("UPDATE items SET payload = 'changed' WHERE id % 500 = 0")
+    backup.conn.commit()
+    states[os.path.basename(backup.manual_backup()["backup_path"])] = dump(backup.db_path)
+    backup.cursor.execute("DELETE FROM items WHERE id > 1000")
+    backup.conn.commit()
+    backup.cursor.execute("VACUUM")  # The file shrinks, the restore has to truncate it
+    states[os.path.basename(backup.manual_backup()["backup_path"])] = dump(backup.db_path)
+    names = list(states)
+    assert names[0].endswith(".db") and all(name.endswith(".delta") for name in names[1:])
+    for name, expected in states.items():
+        assert restore(backup, tmp_path, name) == expected
+
+def test_hashes_are_kept_in_a_sidecar(backup):
+    backup.cursor.execute("UPDATE items SET payload = 'changed' WHERE id = 1")
+    backup.conn.commit()
+    delta = backup.manual_backup()["backup_path"]
+    with open(backup.json_path) as json_file:
+        state = json.load(json_file)["incremental"]
+    assert "hashes" not in state
+    assert state["hashes_file"] == os.path.basename(delta) + ".hashes"
+    sidecars = [name for name in os.listdir(backup.backup_folder) if name.endswith(".hashes")]
+    assert sidecars == [state["hashes_file"]]  # The previous link's one is removed
+    block_size = state["page_size"] * state["block_pages"]
+    blocks = -(-os.path.getsize(backup.db_path) // block_size)
+    assert os.path.getsize(os.path.join(backup.backup_folder, state["hashes_file"])) == 16 * blocks
+
+def test_failed_backup_leaves_no_temporary_files(backup, monkeypatch):
+    before = set(os.listdir(backup.backup_folder))
+    with open(backup.json_path) as json_file:
+        checkpoint = json_file.read()
+    def failing_replace(*args):
+        raise OSError("simulated failure")
+    monkeypatch.setattr(sqlite_backup.os, "replace", failing_replace)
+    backup.cursor.execute("UPDATE items SET payload = 'changed' WHERE id = 1")
+    backup.conn.commit()
+    assert backup.manual_backup() is None
+    monkeypatch.undo()
+    assert set(os.listdir(backup.backup_folder)) == before
+    with open(backup.json_path) as json_file:
+        assert json.load(json_file)["incremental"] == json.loads(checkpoint)["incremental"]
+
+def test_checkpoint_with_inline_hashes_still_chains(backup):
+    with open(backup.json_path) as json_file:
+        data = json.load(json_file)
+    sidecar = os.path.join(backup.backup_folder, data["incremental"].pop("hashes_file"))
+    with open(sidecar, "rb") as hashes_file:
+        content = hashes_file.read()
+    os.remove(sidecar)
+    data["incremental"]["hashes"] = [content[i:i + 16].hex() for i in range(0, len(content), 16)]
+    with open(backup.json_path, "w") as json_file:
+        json.dump(data, json_file)
+    assert backup.manual_backup()["backup_path"].endswith(".delta")
+    with open(backup.json_path) as json_file:
+        assert "hashes" not in json.load(json_file)["incremental"]
+
+def update_and_backup(backup, row_id):
+    backup.cursor.execute("UPDATE items SET payload = 'changed' WHERE id = ?", (row_id,))
+    backup.conn.commit()
+    return os.path.basename(backup.manual_backup()["backup_path"])
+
+def test_long_chain_gets_a_new_base(backup, tmp_path):
+    backup.set_backup_rules(max_chain=2)
+    states = {backup.list_backups()[0]: dump(backup.db_path)}
+    for i in range(1, 5):
+        name = update_and_backup(backup, i)
+        states[name] = dump(backup.db_path)
+    assert [os.path.splitext(name)[1] for name in states] == [".db", ".delta", ".delta", ".db", ".delta"]
+    for name, expected in states.items():  # The old chain still restores
+        assert restore(backup, tmp_path, name) == expected
+
+def test_prune_counts_chain_links(backup):
+    backup.set_backup_rules(max_chain=2)
+    names = [backup.list_backups()[0]] + [update_and_backup(backup, i) for i in range(1, 5)]
+    assert sorted(backup.prune_backups(keep=2, verbose=False)) == sorted(names[:3])
+    assert sorted(backup.list_backups()) == sorted(names[3:])
+    assert backup.prune_backups(keep=1, verbose=False) == []  # The newest delta needs its base
+    assert [name for name in os.listdir(backup.backup_folder) if name.endswith(".hashes")] == [names[-1] + ".hashes"]
+
+def test_prune_keeps_what_kept_deltas_need(backup):
+    names = [backup.list_backups()[0]] + [update_and_backup(backup, i) for i in range(1, 4)]
+    assert backup.prune_backups(keep=1, verbose=False) == []  # One chain: every link is needed by the newest one
+    assert sorted(backup.list_backups()) == sorted(names)
+
+def test_rollback_journal_is_streamed_without_a_copy(backup, monkeypatch):
+    def no_copy(*args, **kwargs):
+        raise AssertionError("the snapshot should read the database file")
+    monkeypatch.setattr(sqlite_backup.tempfile, "mkstemp", no_copy)
+    assert update_and_backup(backup, 1).endswith(".delta")
+
+def test_concurrent_snapshots_use_their_own_files(tmp_path, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda *args: "y")
+    backups = []
+    for name in ("a", "b"):
+        conn = sqlite3.connect(tmp_path / f"{name}.db")
+        conn.execute("PRAGMA journal_mode = WAL")  # Copied to a temporary file first
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, payload TEXT)")
+        conn.executemany("INSERT INTO items (payload) VALUES (?)", [(f"{name}{i}" * 50,) for i in range(3000)])
+        conn.commit()
+        conn.close()
+        backups.append(SQLite_Backup(str(tmp_path / f"{name}.db"), backup_folder=str(tmp_path / "backup"), 
+                                     engine="incremental", pages=5, sleep=0.001))
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(lambda backup: backup._backup(backup.db_path), backups))
+        for backup, result in zip(backups, results):
+            assert result is not None
+            assert restore(backup, tmp_path, os.path.basename(result["backup_path"])) == dump(backup.db_path)
+        assert not [name for name in os.listdir(tmp_path / "backup") if name.endswith(".tmp")]
+    finally:
+        for backup in backups:
+            backup.close_conn(verbose=False)
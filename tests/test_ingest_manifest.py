@@ -0,0 +1,102 @@
+import os, sqlite3
+import pytest
+from db_tools import SQLite_Data_Extractor
+from db_tools.ingest_manifest import IngestManifest
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    conn = sqlite3.connect(tmp_path / "manifest.db")
+    manifest = IngestManifest(conn)
+    manifest.hashed = []
+    hash_file = manifest.hash_file
+    def counted(source_path):
+        manifest.hashed.append(source_path)
+        return hash_file(source_path)
+    monkeypatch.setattr(manifest, "hash_file", counted)
+    yield manifest
+    conn.close()
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.csv"
+    path.write_text("a,b\n1,2\n")
+    return str(path)
+
+def ingest(manifest, path):
+    changed, fingerprint = manifest.check(path)
+    if changed:
+        manifest.record(path, fingerprint)
+    return changed
+
+def test_unchanged_file_is_not_hashed(manifest, source):
+    assert ingest(manifest, source)
+    assert len(manifest.hashed) == 1  # New file: hashed once, by record()
+    assert not ingest(manifest, source)
+    assert len(manifest.hashed) == 1  # Size and mtime match: no read
+
+def test_touched_file_is_rehashed_once(manifest, source):
+    ingest(manifest, source)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not ingest(manifest, source)
+    assert len(manifest.hashed) == 2
+    assert not ingest(manifest, source)  # The new mtime was recorded
+    assert len(manifest.hashed) == 2
+
+def test_changed_content(manifest, source):
+    ingest(manifest, source)
+    stat = os.stat(source)
+    with open(source, "w") as f:
+        f.write("a,b\n3,4\n")  # Same size
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert ingest(manifest, source)
+    with open(source, "a") as f:
+        f.write("5,6\n")
+    hashed = len(manifest.hashed)
+    assert manifest.check(source)[0]
+    assert len(manifest.hashed) == hashed  # Resized: changed without reading it
+
+def test_forget(manifest, source, tmp_path):
+    other = tmp_path / "other.csv"
+    other.write_text("a\n1\n")
+    ingest(manifest, source)
+    ingest(manifest, str(other))
+    manifest.forget(source)
+    assert [entry[0] for entry in manifest.entries()] == [str(other)]
+    assert ingest(manifest, source)
+    manifest.forget()
+    assert manifest.entries() == []
+
+@pytest.fixture
+def extractor(tmp_path):
+    folder = tmp_path / "data"
+    folder.mkdir()
+    (folder / "items.csv").write_text("a,b\n1,2\n3,4\n")
+    extractor = SQLite_Data_Extractor(str(tmp_path / "ingest.db"), source_folder_path=str(folder))
+    yield extractor
+    extractor.close_conn(verbose=False)
+
+def count(extractor):
+    return extractor.cursor.execute("SELECT count(*) FROM items").fetchone()[0]
+
+def test_store_skips_unchanged_files(extractor):
+    extractor.store("items.csv", skip_unchanged=True)
+    extractor.cursor.execute("INSERT INTO items VALUES (5, 6)")
+    extractor.conn.commit()
+    extractor.store("items.csv", skip_unchanged=True)
+    assert count(extractor) == 3  # Skipped, the table wasn't replaced
+    extractor.manifest.forget(os.path.join(extractor.source_folderpath, "items.csv"))
+    extractor.store("items.csv", skip_unchanged=True)
+    assert count(extractor) == 2
+
+def test_failed_ingestion_is_not_recorded(extractor, monkeypatch):
+    def fail(index):
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(extractor, "_datasheet_dispatch", fail)
+    with pytest.raises(RuntimeError):
+        extractor.store("items.csv", skip_unchanged=True)
+    assert extractor.manifest.entries() == []
+    monkeypatch.undo()
+    extractor.store("items.csv", skip_unchanged=True)
+    assert count(extractor) == 2
+    assert len(extractor.manifest.entries()) == 1
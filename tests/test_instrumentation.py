@@ -0,0 +1,41 @@
+import time
+import pytest
+from db_tools import SQLite_Handler
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = SQLite_Handler(str(tmp_path / "traced.db"))
+    handler.cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    handler.cursor.executemany("INSERT INTO items (name) VALUES (?)", [(f"n{i}",) for i in range(100)])
+    handler.conn.commit()
+    instrumentation = handler.enable_instrumentation(slow_ms=200, verbose=False)
+    yield handler, instrumentation
+    handler.disable_instrumentation()
+    handler.close_conn(verbose=False)
+
+def test_idle_time_is_not_charged_to_a_direct_statement(handler):
+    handler, instrumentation = handler
+    handler.cursor.execute("SELECT 1").fetchall()  # Outside a wrapped method
+    time.sleep(0.3)
+    handler.preview_table("items", 5, verbose=False)
+    assert not instrumentation.slow_queries
+    assert all(stats["max_s"] < 0.2 for stats in instrumentation.stats()["statements"].values())
+    assert not any(sql.startswith("SELECT ?") for sql in instrumentation.stats()["statements"])
+
+def test_method_statements_are_timed(handler):
+    handler, instrumentation = handler
+    handler.preview_table("items", 5, verbose=False)
+    statements = instrumentation.stats()["statements"]
+    assert any("items" in sql for sql in statements)
+    assert instrumentation.stats()["methods"]["SQLite_Handler.preview_table"]["calls"] == 1
+
+def test_slow_statement_inside_a_method(handler, monkeypatch):
+    handler, instrumentation = handler
+    preview_table = handler.preview_table.__wrapped__
+    def slow_preview(*args, **kwargs):
+        rows = preview_table(*args, **kwargs)
+        time.sleep(0.3)  # Fetch-side work of the method stays with its last statement
+        return rows
+    monkeypatch.setattr(handler, "preview_table", instrumentation._wrap("preview_table", slow_preview))
+    handler.preview_table("items", 5, verbose=False)
+    assert len(instrumentation.slow_queries) == 1
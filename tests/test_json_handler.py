@@ -0,0 +1,38 @@
+import os, json
+import pytest
+from db_tools import JSONhandler
+
+def write_json(folder, name, data):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = JSONhandler(str(tmp_path / "json.db"))
+    yield handler
+    handler.close_conn(verbose=False)
+
+def test_keys_differing_by_case_share_a_column(handler, tmp_path):
+    folder = tmp_path / "input" / "items"
+    handler.cursor.execute('CREATE TABLE items (filename TEXT, name TEXT)')
+    handler.conn.commit()
+    write_json(folder, "a.json", {"Name": "first", "Size": 1})
+    write_json(folder, "b.json", {"name": "second", "size": 2})
+    assert handler.process_jsons(str(tmp_path / "input"), batched=True, workers=1) == 2
+    assert [row[1] for row in handler.cursor.execute('PRAGMA table_info("items")')] == ["filename", "name", "Size"]
+    assert sorted(handler.cursor.execute("SELECT filename, name, size FROM items")) == [("a", "first", 1), ("b", "second", 2)]
+
+def test_failed_batch_rolls_back_schema_changes(handler, tmp_path):
+    folder = tmp_path / "input" / "items"
+    handler.cursor.execute('CREATE TABLE items (filename TEXT)')
+    handler.cursor.execute("CREATE TRIGGER reject AFTER INSERT ON items BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+    handler.conn.commit()
+    write_json(folder, "a.json", {"extra": 1})
+    write_json(tmp_path / "input" / "others", "b.json", {"x": 1})
+    with pytest.raises(Exception, match="rejected"):
+        handler.process_jsons(str(tmp_path / "input"), batched=True, workers=1)
+    tables = [row[0] for row in handler.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    assert tables == ["items"]
+    assert [row[1] for row in handler.cursor.execute('PRAGMA table_info("items")')] == ["filename"]
+    assert os.path.exists(folder / "a.json")
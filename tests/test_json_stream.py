@@ -0,0 +1,52 @@
+import json
+import pytest
+from db_tools import SQLite_Data_Extractor
+from db_tools.sqlite_data_extractor import _iter_json_records
+
+def records(tmp_path, text, read_size=1 << 20):
+    path = tmp_path / "records.json"
+    path.write_text(text, encoding="utf-8")
+    return list(_iter_json_records(str(path), read_size))
+
+@pytest.mark.parametrize("read_size", [1, 3, 7, 1 << 20])  # Small reads cut values at every position
+@pytest.mark.parametrize("text, expected", [
+    ('[{"a": 1}, {"a": 22}, 333]', [{"a": 1}, {"a": 22}, 333]),
+    ('[\n  {"a": [1, 2]},\n  {"b": "x]"}\n]\n', [{"a": [1, 2]}, {"b": "x]"}]),
+    ('{"a": 1}\n{"a": 2}\n', [{"a": 1}, {"a": 2}]),
+    ('[1,2]', [1, 2]),
+    ('[]', []),
+    ('{"a": {"b": 1}}', [{"a": {"b": 1}}]),
+    ('12345\nnull\n"s"\n', [12345, None, "s"]),
+    ('', []),
+])
+def test_layouts(tmp_path, text, expected, read_size):
+    assert records(tmp_path, text, read_size) == expected
+
+@pytest.mark.parametrize("read_size", [5, 7, 1 << 20])  # The first line has to fit in a read
+def test_lines_of_arrays(tmp_path, read_size):
+    assert records(tmp_path, '[1,2]\n[3,4]\n[5]', read_size) == [[1, 2], [3, 4], [5]]
+
+def test_large_array_streamed_then_trailing_data_is_an_error(tmp_path):
+    items = [{"value": i} for i in range(200)]
+    assert records(tmp_path, json.dumps(items), read_size=64) == items
+    with pytest.raises(ValueError, match="after the top-level"):  # A first line longer than a read can't be told apart
+        records(tmp_path, json.dumps(items) + "\n[1]", read_size=64)
+
+def test_invalid_json(tmp_path):
+    with pytest.raises(ValueError):
+        records(tmp_path, '{"a": 1}\n{"a": ')
+
+def test_stream_merges_column_case(tmp_path):
+    source = tmp_path / "data"
+    source.mkdir()
+    lines = [{"name": f"n{i}", "v": i} for i in range(4)] + [{"Name": "N4", "V": 4, "extra": 1}, {"NAME": "N5", "name": "n5"}]
+    (source / "people.jsonl").write_text("\n".join(json.dumps(line) for line in lines), encoding="utf-8")
+    extractor = SQLite_Data_Extractor(str(tmp_path / "stream.db"), source_folder_path=str(source))
+    try:
+        extractor.chunksize = 2
+        extractor.store("people.jsonl", stream=True)
+        assert [column.lower() for column in extractor.catalog.columns("people")] == ["name", "v", "extra"]
+        assert extractor.cursor.execute("SELECT name, v, extra FROM people ORDER BY rowid").fetchall() == [
+            ("n0", 0, None), ("n1", 1, None), ("n2", 2, None), ("n3", 3, None), ("N4", 4, 1), ("N5", None, None)]
+    finally:
+        extractor.close_conn(verbose=False)
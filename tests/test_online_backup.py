@@ -0,0 +1,47 @@
+import os, sqlite3
+import pytest
+from db_tools import SQLite_Backup
+
+@pytest.fixture
+def backup(tmp_path, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda *args: "y")
+    db_path = tmp_path / "busy.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO items (payload) VALUES (?)", [(f"item{i}" * 20,) for i in range(5000)])
+    conn.commit()
+    conn.close()
+    backup = SQLite_Backup(str(db_path), backup_folder=str(tmp_path / "backup"), engine="online", pages=10, sleep=0)
+    yield backup
+    backup.close_conn(verbose=False)
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_copy_finishes_under_constant_writes(backup):
+    steps = []
+    def write_every_step(status, remaining, total):  # A commit from another connection after every step
+        steps.append(remaining)
+        backup.cursor.execute("INSERT INTO items (payload) VALUES ('x')")
+        backup.conn.commit()
+    backup.set_backup_rules(progress=write_every_step, max_restarts=2)
+    result = backup.manual_backup()
+    assert result is not None
+    assert count(result["backup_path"]) >= 5000
+    assert steps[-1] == 0
+    assert not [name for name in os.listdir(backup.backup_folder) if name.endswith(".part")]
+
+def test_quiet_database_is_copied_in_steps(backup):
+    steps = []
+    backup.set_backup_rules(progress=lambda status, remaining, total: steps.append(remaining))
+    result = backup.manual_backup()
+    assert count(result["backup_path"]) == 5000
+    assert len(steps) > 1 and steps == sorted(steps, reverse=True)
+
+def test_max_restarts_is_validated(backup):
+    with pytest.raises(ValueError):
+        backup.set_backup_rules(max_restarts=-1)
@@ -0,0 +1,69 @@
+import sqlite3
+import pytest
+from db_tools import QueryBuilder
+
+class FailingCursor:
+    '''Cursor that raises on the *fail_at*-th batch copy into the new table'''
+    def __init__(self, cursor, fail_at):
+        self.cursor = cursor
+        self.fail_at = fail_at
+        self.copies = 0
+
+    def execute(self, sql, *args):
+        if sql.lstrip().startswith("INSERT OR REPLACE INTO") and "SELECT rowid" in sql:
+            self.copies += 1
+            if self.copies == self.fail_at:
+                raise sqlite3.OperationalError("simulated crash")
+        return self.cursor.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+@pytest.fixture
+def builder(tmp_path):
+    builder = QueryBuilder(str(tmp_path / "migrate.db"))
+    builder.cursor.execute('''CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL DEFAULT 'n', 
+        v REAL UNIQUE, owner_id INTEGER, CHECK (v >= 0))''')
+    builder.cursor.execute("CREATE INDEX items_owner ON items (owner_id)")
+    builder.cursor.execute("CREATE TRIGGER items_touch AFTER INSERT ON items BEGIN SELECT 1; END")
+    builder.cursor.executemany("INSERT INTO items (name, v, owner_id) VALUES (?, ?, ?)", 
+                               [(f"item{i}", float(i), i % 3) for i in range(1000)])
+    builder.conn.commit()
+    yield builder
+    builder.close_conn(verbose=False)
+
+def table_sql(builder, name):
+    return builder.cursor.execute("SELECT sql FROM sqlite_master WHERE name = ?", (name,)).fetchone()[0]
+
+def test_constraints_are_kept(builder):
+    result = builder.migrate_table("items", "owner_id", online=True, batch_size=300, verbose=False)
+    assert result["rows"] == 1000
+    sql = table_sql(builder, "items")
+    for constraint in ("INTEGER PRIMARY KEY", "NOT NULL DEFAULT 'n'", "REAL UNIQUE", "CHECK (v >= 0)",
+                       'FOREIGN KEY("owner_id") REFERENCES owners(id)'):
+        assert constraint in sql
+    assert builder.cursor.execute("SELECT count(*) FROM items").fetchone() == (1000,)
+    assert table_sql(builder, "items_owner") is not None and table_sql(builder, "items_touch") is not None
+    with pytest.raises(sqlite3.IntegrityError):
+        builder.cursor.execute("INSERT INTO items (name, v) VALUES (NULL, 5000)")
+    with pytest.raises(sqlite3.IntegrityError):
+        builder.cursor.execute("INSERT INTO items (v) VALUES (1)")
+    builder.conn.rollback()
+
+def test_resume_after_interruption(builder):
+    real_cursor = builder.cursor
+    builder.cursor = FailingCursor(real_cursor, fail_at=3)
+    with pytest.raises(Exception, match="simulated crash"):
+        builder.migrate_table("items", online=True, batch_size=300, verbose=False)
+    builder.cursor = real_cursor
+    assert builder.migration_status("items")[0][2] == 600  # Two batches committed
+    # Writes between the crash and the resume, on copied and not yet copied rows
+    builder.cursor.execute("UPDATE items SET name = 'changed' WHERE id IN (10, 900)")
+    builder.cursor.execute("DELETE FROM items WHERE id IN (20, 950)")
+    builder.cursor.execute("INSERT INTO items (name, v) VALUES ('new', 5000)")
+    builder.conn.commit()
+    expected = builder.cursor.execute("SELECT * FROM items ORDER BY id").fetchall()
+    builder.migrate_table("items", online=True, batch_size=300, verbose=False)
+    assert builder.cursor.execute("SELECT * FROM items ORDER BY id").fetchall() == expected
+    assert builder.migration_status("items") == []
+    assert builder.cursor.execute("SELECT name FROM sqlite_master WHERE name LIKE 'items__migrating%'").fetchall() == []
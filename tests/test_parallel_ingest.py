@@ -0,0 +1,70 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from db_tools import SQLite_Data_Extractor
+from db_tools.sqlite_data_extractor import _bounded_map
+
+class Tracker:
+    '''Counts the tasks submitted and not yet consumed'''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = []
+        self.in_flight = self.peak = 0
+
+    def task(self, item):
+        with self.lock:
+            self.started.append(item)
+        time.sleep(0.001)
+        if item == "boom":
+            raise ValueError("parse failed")
+        return item
+
+    def submit(self, executor):
+        submit = executor.submit
+        def counted(*args):
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            return submit(*args)
+        executor.submit = counted
+
+    def consumed(self):
+        with self.lock:
+            self.in_flight -= 1
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_window_bounds_tasks_in_flight(ordered):
+    tracker = Tracker()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        tracker.submit(executor)
+        results = []
+        for result in _bounded_map(executor, tracker.task, ((i,) for i in range(50)), 4, ordered):
+            tracker.consumed()
+            time.sleep(0.002)  # Slower writer than parsers
+            results.append(result)
+    assert tracker.peak <= 4 + 1  # The window plus the result being written
+    assert (results if ordered else sorted(results)) == list(range(50))
+
+def test_failure_cancels_queued_tasks():
+    tracker = Tracker()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = _bounded_map(executor, tracker.task, [("boom",)] + [(i,) for i in range(100)], 4)
+        with pytest.raises(ValueError):
+            for _ in results:
+                pass
+        results.close()
+    assert len(tracker.started) <= 5
+
+def test_parallel_store_directory(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    for i in range(6):
+        (source / f"part{i}.csv").write_text("a,b\n" + "".join(f"{j},{i}\n" for j in range(10)))
+    extractor = SQLite_Data_Extractor(str(tmp_path / "parallel.db"), source_folder_path=str(source))
+    try:
+        extractor.store_directory(str(source), parallel=True, workers=2)
+        assert len(extractor.ingest_stats) == 6
+        for i in range(6):
+            assert extractor.cursor.execute(f'SELECT count(*), max(b) FROM "part{i}"').fetchone() == (10, i)
+    finally:
+        extractor.close_conn(verbose=False)
@@ -0,0 +1,46 @@
+import sqlite3
+import pytest
+from db_tools import SQLite_Data_Extractor
+
+@pytest.fixture
+def extractor(tmp_path):
+    extractor = SQLite_Data_Extractor(str(tmp_path / "cache.db"), source_folder_path=str(tmp_path))
+    extractor.cursor.execute("CREATE TABLE t (a INTEGER, b TEXT, v REAL)")
+    extractor.cursor.executemany("INSERT INTO t VALUES (?, ?, ?)", [(i, f"b{i}", i / 2) for i in range(10)])
+    extractor.conn.commit()
+    extractor.enable_cache(verbose=False)
+    yield extractor
+    extractor.close_conn(verbose=False)
+
+def test_hit_after_first_read(extractor):
+    first = extractor.retrieve("t")
+    second = extractor.retrieve("t")
+    assert first.equals(second)
+    assert extractor.cache_stats()["hits"] == 1
+
+def test_write_from_another_connection_invalidates(extractor, tmp_path):
+    assert len(extractor.retrieve("t")) == 10
+    other = sqlite3.connect(extractor.db_path)
+    other.execute("INSERT INTO t VALUES (100, 'x', 1.0)")
+    other.commit()
+    other.close()
+    assert len(extractor.retrieve("t")) == 11
+    assert extractor.cache_stats()["invalidations"] == 1
+
+def test_write_from_own_connection_invalidates(extractor):
+    assert len(extractor.retrieve("t")) == 10
+    extractor.cursor.execute("DELETE FROM t WHERE a < 5")
+    extractor.conn.commit()
+    assert len(extractor.retrieve("t")) == 5
+
+def test_list_index_col(extractor):
+    extractor.set_rules(index_col=["a", "b"])
+    df = extractor.retrieve("t")
+    assert df is not None and list(df.index.names) == ["a", "b"]
+    assert extractor.retrieve("t").equals(df)
+
+def test_reader_is_part_of_the_key(extractor):
+    extractor.retrieve("t")
+    extractor.set_rules(reader="columnar")
+    extractor.retrieve("t")
+    assert extractor.cache_stats()["hits"] == 0
@@ -0,0 +1,73 @@
+import pytest
+from db_tools import QueryBuilder
+
+@pytest.fixture
+def builder(tmp_path):
+    builder = QueryBuilder(str(tmp_path / "tags.db"))
+    builder.cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, tags TEXT)")
+    builder.cursor.executemany("INSERT INTO items (tags) VALUES (?)", [("a,b",), ("b,c",), (None,), ("a",)])
+    builder.conn.commit()
+    yield builder
+    builder.close_conn(verbose=False)
+
+def index_rows(builder):
+    return sorted(builder.cursor.execute('SELECT row_id, tag FROM "items__tags__tags"').fetchall())
+
+def expected_rows(builder, sep=","):
+    rows = builder.cursor.execute("SELECT rowid, tags FROM items WHERE tags IS NOT NULL").fetchall()
+    return sorted({(rowid, tag) for rowid, tags in rows for tag in tags.split(sep)})
+
+def test_index_matches_scan(builder):
+    builder.create_tag_index("items", "tags")
+    for whitelist, blacklist in [(["a"], None), (["b"], ["c"]), (None, ["a"]), (["a", "b"], None)]:
+        scan = builder.filter_rows_by_tags("items", "tags", whitelist, blacklist, use_index=False)
+        index = builder.filter_rows_by_tags("items", "tags", whitelist, blacklist, use_index=True)
+        assert sorted(scan) == sorted(index)
+
+def test_triggers_follow_writes(builder):
+    builder.create_tag_index("items", "tags")
+    assert index_rows(builder) == expected_rows(builder)
+    builder.cursor.execute("INSERT INTO items (tags) VALUES ('c,d,d')")
+    builder.cursor.execute("UPDATE items SET tags = 'e' WHERE id = 1")
+    builder.cursor.execute("UPDATE items SET tags = NULL WHERE id = 2")
+    builder.cursor.execute("UPDATE items SET tags = 'f,a' WHERE id = 3")
+    builder.cursor.execute("UPDATE items SET id = 10 WHERE id = 4")
+    builder.cursor.execute("DELETE FROM items WHERE id = 5")
+    builder.conn.commit()
+    assert index_rows(builder) == expected_rows(builder)
+
+def test_control_characters_and_quotes(builder):
+    builder.create_tag_index("items", "tags")
+    values = ["tab\there", "new\nline,x", 'quo"te,back\\slash', "", "\r\x1f,\u2028"]
+    for value in values:
+        builder.cursor.execute("INSERT INTO items (tags) VALUES (?)", (value,))
+    builder.conn.commit()
+    assert index_rows(builder) == expected_rows(builder)
+    assert builder.filter_rows_by_tags("items", "tags", ["tab\there"]) == [(5, "tab\there")]
+
+def test_multi_character_separator(builder):
+    builder.cursor.execute("INSERT INTO items (tags) VALUES ('x || y || z')")
+    builder.conn.commit()
+    builder.create_tag_index("items", "tags", sep=" || ")
+    assert index_rows(builder) == expected_rows(builder, sep=" || ")
+    assert builder.filter_rows_by_tags("items", "tags", ["y"], use_index=True) == [(5, "x || y || z")]
+
+def test_insert_or_replace_clears_old_tags(builder):
+    builder.create_tag_index("items", "tags")
+    builder.cursor.execute("INSERT OR REPLACE INTO items VALUES (1, 'x')")
+    builder.cursor.execute("INSERT OR REPLACE INTO items VALUES (2, NULL)")
+    builder.conn.commit()
+    assert index_rows(builder) == expected_rows(builder)
+    assert builder.filter_rows_by_tags("items", "tags", whitelist=["a"]) == [(4, "a")]
+
+def test_recreated_table_ignores_stale_index(builder):
+    builder.create_tag_index("items", "tags")
+    builder.cursor.execute("DROP TABLE items")  # What a replace by store does
+    builder.cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, tags TEXT)")
+    builder.cursor.execute("INSERT INTO items VALUES (1, 'zzz')")
+    builder.conn.commit()
+    assert builder.filter_rows_by_tags("items", "tags", whitelist=["b"]) == []
+    with pytest.raises(ValueError):
+        builder.filter_rows_by_tags("items", "tags", whitelist=["b"], use_index=True)
+    builder.create_tag_index("items", "tags", verbose=False)
+    assert builder.filter_rows_by_tags("items", "tags", whitelist=["zzz"]) == [(1, "zzz")]